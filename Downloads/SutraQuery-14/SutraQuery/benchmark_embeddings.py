@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Embedding dispatcher benchmark against a local stub of the Mistral embeddings endpoint.
+The stub enforces a request quota, answers over-quota requests with 429 and Retry-After, and
+adds a fixed latency. The benchmark embeds the Gita commentaries through APIClient.get_embeddings
+with different limiter and concurrency settings and reports throughput, 429s and time spent waiting.
+
+Usage:
+    python benchmark_embeddings.py [--quota RPS] [--latency MS] [--texts N]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from services.api_client import APIClient, EMBEDDING_DIM
+from services.rate_limiter import TokenBucketLimiter
+
+logging.basicConfig(level=logging.ERROR)
+
+
+def stub_embedding(text: str) -> list:
+    """Deterministic embedding the stub returns for a text"""
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    return (np.frombuffer(digest, dtype=np.uint8).astype(np.float32) / 255.0).tolist() * (EMBEDDING_DIM // 32)
+
+
+class StubServer:
+    """Threaded HTTP server for POST /v1/embeddings with a fixed-window request quota"""
+
+    def __init__(self, quota_per_second: float, latency: float):
+        self.quota_per_second = quota_per_second
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.accepted = 0
+        self.rejected = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if not stub.admit():
+                    self.respond(429, {"message": "rate limited"}, {"Retry-After": "0.5"})
+                    return
+                time.sleep(stub.latency)
+                data = [{"index": i, "embedding": stub_embedding(text)} for i, text in enumerate(body["input"])]
+                self.respond(200, {"data": data})
+
+            def respond(self, status, payload, headers=None):
+                encoded = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def admit(self) -> bool:
+        """Count the request against the current one-second window"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start, self.window_count = now, 0
+            if self.window_count >= self.quota_per_second:
+                self.rejected += 1
+                return False
+            self.window_count += 1
+            self.accepted += 1
+            return True
+
+    def reset(self):
+        with self.lock:
+            self.accepted = self.rejected = 0
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_scenario(label: str, stub: StubServer, texts: list, limiter_rate: float, concurrency: int) -> bool:
+    Config.EMBEDDING_CONCURRENCY = concurrency
+    client = APIClient()
+    # The stub only enforces a request quota, so the token budget is left out of the way
+    client.limiter = TokenBucketLimiter(limiter_rate, tokens_per_minute=1e9)
+    stub.reset()
+
+    started = time.monotonic()
+    embeddings = client.get_embeddings(texts, use_api=True, fallback=False)
+    elapsed = time.monotonic() - started
+
+    expected = np.array([stub_embedding(text) for text in texts], dtype=np.float32)
+    correct = bool(np.array_equal(embeddings, expected))
+    stats = client.embedding_stats()
+    print(f"{label}")
+    print(f"  limiter:     {limiter_rate:g} req/s, {concurrency} in flight")
+    print(f"  elapsed:     {elapsed:8.2f} s")
+    print(f"  throughput:  {len(texts) / elapsed:8.1f} texts/s")
+    print(f"  requests:    {stub.accepted} accepted, {stub.rejected} rejected with 429")
+    print(f"  waiting:     {stats['wait_seconds']:8.2f} s in the limiter (final rate {stats['current_rate']} req/s)")
+    print(f"  correct:     {correct}")
+    return correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the embedding dispatcher against a local stub server")
+    parser.add_argument('--quota', type=float, default=10, help='Requests per second the stub accepts')
+    parser.add_argument('--latency', type=float, default=200, help='Stub response latency in milliseconds')
+    parser.add_argument('--texts', type=int, default=1000, help='Number of texts to embed')
+    args = parser.parse_args()
+
+    df = pd.read_csv(os.path.join(Config.DATA_DIR, Config.get_data_files()["processed_gita"]))
+    texts = df['explanation'].dropna().astype(str).tolist()
+    texts = (texts * (args.texts // len(texts) + 1))[:args.texts]
+
+    stub = StubServer(args.quota, args.latency / 1000.0)
+    Config.MISTRAL_BASE_URL = stub.url
+    Config.EMBEDDING_BATCH_MAX_ITEMS = 8
+    # Every scenario has to reach the stub, so the on-disk embedding cache is off
+    Config.EMBEDDING_CACHE_FILE = ""
+    ok = True
+    try:
+        ok &= run_scenario("Sequential, limiter at the quota", stub, texts, args.quota, 1)
+        ok &= run_scenario("Concurrent, limiter at the quota", stub, texts, args.quota, 8)
+        ok &= run_scenario("Concurrent, limiter at 3x the quota (adapts from 429s)", stub, texts, args.quota * 3, 8)
+    finally:
+        stub.close()
+
+    if not ok:
+        print("Embeddings returned through the dispatcher do not match the stub")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
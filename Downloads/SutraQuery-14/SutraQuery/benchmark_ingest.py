@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Ingest benchmarks.
+Compares the current DocumentProcessor code paths with reference copies of the
+implementations they replaced, checks that both produce identical output, and
+reports the speedup.
+
+Usage:
+    python benchmark_ingest.py [--repeat N] csv
+    python benchmark_ingest.py [--repeat N] txt
+    python benchmark_ingest.py [--repeat N] chunker
+    python benchmark_ingest.py [--repeat N] hash
+    python benchmark_ingest.py [--repeat N] dedup
+"""
+
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from services.api_client import hash_embedding, hash_embeddings
+from services.dedup import NearDuplicateIndex, source_reference
+from services.document_processor import DocumentProcessor
+from services.faiss_vector_store import FaissVectorStore
+from services.ingest_manifest import ChunkIdAssigner
+from utils.text_utils import TextChunker
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def legacy_process_csv_file(processor: DocumentProcessor, filepath: str, source_name: str):
+    """Reference copy of the original DataFrame.iterrows CSV path"""
+    df = pd.read_csv(filepath)
+    documents = []
+
+    for _, row in df.iterrows():
+        chapter = str(row.get('chapter', ''))
+        verse = str(row.get('verse', ''))
+        sanskrit_val = row.get('sanskrit')
+        translation_val = row.get('translation')
+        explanation_val = row.get('explanation')
+        question_val = row.get('question')
+
+        sanskrit = str(sanskrit_val) if sanskrit_val is not None and pd.notna(sanskrit_val) else ''
+        translation = str(translation_val) if translation_val is not None and pd.notna(translation_val) else ''
+        explanation = str(explanation_val) if explanation_val is not None and pd.notna(explanation_val) else ''
+        question = str(question_val) if question_val is not None and pd.notna(question_val) else ''
+
+        text_parts = []
+        if sanskrit:
+            text_parts.append(f"Sanskrit: {sanskrit}")
+        if translation:
+            text_parts.append(f"Translation: {translation}")
+        if explanation:
+            text_parts.append(f"Explanation: {explanation}")
+        if question:
+            text_parts.append(f"Related Question: {question}")
+
+        text_content = "\n\n".join(text_parts)
+
+        if text_content.strip():
+            chunks = processor.chunker.chunk_text(text_content)
+
+            for i, chunk in enumerate(chunks):
+                documents.append({
+                    "text": chunk,
+                    "source": source_name,
+                    "chapter": chapter,
+                    "verse": verse,
+                    "sanskrit": sanskrit,
+                    "translation": translation,
+                    "explanation": explanation,
+                    "metadata": {
+                        "verse_id": f"{chapter}.{verse}",
+                        "chunk_index": i,
+                        "total_chunks": len(chunks),
+                        "has_question": bool(question),
+                        "question": question
+                    }
+                })
+
+    return documents
+
+
+def legacy_process_kanda_text(processor: DocumentProcessor, filepath: str, source_name: str):
+    """Reference copy of the original split-based Kanda parser, fed the file read in text mode"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        text_content = f.read()
+    documents = []
+
+    sections = text_content.split('----------------------------------------')
+    for section in sections:
+        section = section.strip()
+        if not section:
+            continue
+
+        lines = section.split('\n')
+        chapter = ""
+        verse = ""
+        content = ""
+
+        for line in lines:
+            line = line.strip()
+            if line.startswith('Chapter:'):
+                chapter = line.replace('Chapter:', '').strip()
+            elif line.startswith('Verse:'):
+                verse = line.replace('Verse:', '').strip()
+            elif line.startswith('Content:'):
+                content = line.replace('Content:', '').strip()
+
+        if content:
+            full_text = f"Chapter: {chapter}\nVerse: {verse}\nContent: {content}"
+            chunks = processor.chunker.chunk_text(full_text)
+
+            for i, chunk in enumerate(chunks):
+                documents.append({
+                    "text": chunk,
+                    "source": source_name,
+                    "chapter": chapter,
+                    "verse": verse,
+                    "sanskrit": "",
+                    "translation": content,
+                    "explanation": "",
+                    "metadata": {
+                        "verse_id": f"{chapter}-{verse}",
+                        "chunk_index": i,
+                        "total_chunks": len(chunks)
+                    }
+                })
+
+    return documents
+
+
+def legacy_process_gita_text(processor: DocumentProcessor, filepath: str, source_name: str):
+    """Reference copy of the original nested while-loop Gita TXT parser"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+    documents = []
+
+    current_chapter = ""
+    current_verse = ""
+    lines = content.split('\n')
+    i = 0
+
+    while i < len(lines):
+        line = lines[i].strip()
+
+        if line.startswith('Chapter-') or line.startswith('CHAPTER'):
+            match = re.search(r'(\d+)', line)
+            current_chapter = match.group(1) if match else ""
+            i += 1
+            continue
+
+        if line.startswith('TEXT '):
+            match = re.search(r'TEXT\s+(\d+)', line)
+            current_verse = match.group(1) if match else ""
+            i += 1
+
+            sanskrit_lines = []
+            while i < len(lines) and not lines[i].strip().startswith('TRANSLATION'):
+                if lines[i].strip() and not lines[i].strip().startswith('TEXT'):
+                    sanskrit_lines.append(lines[i].strip())
+                i += 1
+
+            current_sanskrit = ' '.join(sanskrit_lines)
+
+            if i < len(lines) and lines[i].strip().startswith('TRANSLATION'):
+                i += 1
+
+                content_lines = []
+                while i < len(lines) and not lines[i].strip().startswith('TEXT '):
+                    if lines[i].strip():
+                        content_lines.append(lines[i].strip())
+                    i += 1
+
+                current_text = ' '.join(content_lines)
+
+                if current_text and current_chapter and current_verse:
+                    full_text = f"Chapter {current_chapter}, Verse {current_verse}\n\n"
+                    if current_sanskrit:
+                        full_text += f"Sanskrit: {current_sanskrit}\n\n"
+                    full_text += f"Translation and Commentary: {current_text}"
+
+                    chunks = processor.chunker.chunk_text(full_text)
+
+                    for j, chunk in enumerate(chunks):
+                        documents.append({
+                            "text": chunk,
+                            "source": source_name,
+                            "chapter": current_chapter,
+                            "verse": current_verse,
+                            "sanskrit": current_sanskrit,
+                            "translation": current_text,
+                            "explanation": "",
+                            "metadata": {
+                                "verse_id": f"{current_chapter}.{current_verse}",
+                                "chunk_index": j,
+                                "total_chunks": len(chunks)
+                            }
+                        })
+                continue
+
+        i += 1
+
+    return documents
+
+
+def legacy_chunk_text(chunker: TextChunker, text: str, last_boundary: bool = False):
+    """Reference copy of the original chunker, which re-scanned the overlap window for every chunk
+    and took the first boundary found in it. With last_boundary it takes the last boundary of the most
+    preferred kind instead, the rule the current chunker implements without slicing the window."""
+    if not text or len(text) < chunker.chunk_size:
+        return [text] if text else []
+
+    def find_sentence_boundary(start: int, end: int) -> int:
+        window = text[start:end]
+        for pattern in (r'[.!?।॥]\s+', r'\n\s*\n', r'[,;]\s+'):
+            match = None
+            for match in re.finditer(pattern, window):
+                if not last_boundary:
+                    break
+            if match:
+                return start + match.end()
+        return end
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + chunker.chunk_size
+        if end < len(text):
+            sentence_end = find_sentence_boundary(end - chunker.overlap, end)
+            if sentence_end > start:
+                end = sentence_end
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = max(start + 1, end - chunker.overlap)
+        if start >= len(text):
+            break
+    return chunks
+
+
+def legacy_hash_embedding(text: str):
+    """Reference copy of the original hash-based fallback embedding (without its per-call warning)"""
+    text_hash = hashlib.md5(text.encode()).hexdigest()
+    embedding = []
+    for i in range(0, len(text_hash), 2):
+        embedding.append(int(text_hash[i:i+2], 16) / 255.0)
+    while len(embedding) < 1024:
+        embedding.extend(embedding[:min(len(embedding), 1024 - len(embedding))])
+    return embedding[:1024]
+
+
+def write_gita_text(path: str):
+    """Render the processed Gita CSV in the Gita edition TXT layout (there is no such file in the data set)"""
+    df = pd.read_csv(os.path.join(Config.DATA_DIR, Config.get_data_files()["processed_gita"]))
+    current_chapter = None
+    with open(path, 'w', encoding='utf-8') as f:
+        for chapter, verse, sanskrit, translation, explanation in zip(
+                df['chapter'], df['verse'], df['sanskrit'], df['translation'], df['explanation']):
+            if chapter != current_chapter:
+                f.write(f"\nCHAPTER {chapter}\n\n")
+                current_chapter = chapter
+            f.write(f"TEXT {verse}\n\n{sanskrit}\n\nTRANSLATION\n\n{translation}\n\nPURPORT\n\n{explanation}\n\n")
+
+
+def best_of(repeat: int, func, *args):
+    """Return (best wall time, result) over `repeat` runs"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def peak_memory_mb(func, *args) -> float:
+    """Peak Python heap allocated while running `func` (mmap'd file pages are not counted)"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def report(label: str, legacy_time: float, current_time: float, identical: bool, count: int, memory=None,
+           check: str = "identical"):
+    print(f"{label}")
+    print(f"  chunks:    {count}")
+    print(f"  legacy:    {legacy_time * 1000:8.1f} ms")
+    print(f"  current:   {current_time * 1000:8.1f} ms")
+    print(f"  speedup:   {legacy_time / current_time:8.2f}x")
+    if memory:
+        print(f"  peak heap: {memory[0]:8.1f} MB legacy, {memory[1]:.1f} MB current")
+    print(f"  {check}: {identical}")
+
+
+def bench_csv(args) -> bool:
+    """Benchmark the vectorized CSV path against the iterrows loop"""
+    processor = DocumentProcessor()
+    data_files = Config.get_data_files()
+    ok = True
+
+    for source_name in ("processed_gita", "bhagavad_gita_qa"):
+        filepath = os.path.join(Config.DATA_DIR, data_files[source_name])
+        legacy_time, legacy_docs = best_of(args.repeat, legacy_process_csv_file, processor, filepath, source_name)
+        current_time, current_docs = best_of(args.repeat, processor.process_csv_file, filepath, source_name)
+        identical = legacy_docs == current_docs
+        ok = ok and identical
+        report(f"CSV {source_name} ({os.path.basename(filepath)})", legacy_time, current_time, identical, len(current_docs))
+
+    return ok
+
+
+def bench_txt(args) -> bool:
+    """Benchmark the single-pass TXT scanners against the split/while-loop parsers"""
+    processor = DocumentProcessor()
+    ok = True
+
+    kanda_files = sorted(glob.glob(os.path.join(Config.DATA_DIR, "valmiki_ramayan_*_kanda_*.txt")))
+    if not kanda_files:
+        print(f"No Kanda text files found in {Config.DATA_DIR}")
+        return False
+    totals = [0.0, 0.0, 0]
+    for filepath in kanda_files:
+        source_name = os.path.basename(filepath).split('_book')[0]
+        legacy_time, legacy_docs = best_of(args.repeat, legacy_process_kanda_text, processor, filepath, source_name)
+        current_time, current_docs = best_of(args.repeat, processor.process_txt_file, filepath, source_name)
+        identical = legacy_docs == current_docs
+        ok = ok and identical
+        totals[0] += legacy_time
+        totals[1] += current_time
+        totals[2] += len(current_docs)
+        memory = (peak_memory_mb(legacy_process_kanda_text, processor, filepath, source_name),
+                  peak_memory_mb(processor.process_txt_file, filepath, source_name))
+        report(f"Kanda {os.path.basename(filepath)}", legacy_time, current_time, identical, len(current_docs), memory)
+    report(f"Kanda total ({len(kanda_files)} files)", totals[0], totals[1], ok, totals[2])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "gita_edition.txt")
+        write_gita_text(filepath)
+        legacy_time, legacy_docs = best_of(args.repeat, legacy_process_gita_text, processor, filepath, "gita_txt")
+        current_time, current_docs = best_of(args.repeat, processor.process_txt_file, filepath, "gita_txt")
+        identical = legacy_docs == current_docs
+        ok = ok and identical
+        report("Gita edition TXT (rendered from the processed Gita CSV)", legacy_time, current_time, identical,
+               len(current_docs))
+
+    return ok
+
+
+def bench_chunker(args) -> bool:
+    """Benchmark the chunker against the first-boundary, slice-per-window chunker on the Gita commentaries.
+    The current chunker breaks at the last boundary in the window, so its output is checked against the
+    slice-per-window chunker run with the same last-boundary rule rather than against the legacy chunks."""
+    chunker = TextChunker(chunk_size=Config.CHUNK_SIZE, overlap=Config.CHUNK_OVERLAP)
+    df = pd.read_csv(os.path.join(Config.DATA_DIR, Config.get_data_files()["processed_gita"]))
+    texts = [text for text in df['explanation'].dropna().astype(str) if len(text) >= chunker.chunk_size]
+    texts.sort(key=len, reverse=True)
+    ok = True
+
+    for label, sample in (("all commentaries", texts), ("longest 100 commentaries", texts[:100])):
+        legacy_time, legacy_chunks = best_of(args.repeat, lambda: [legacy_chunk_text(chunker, text) for text in sample])
+        current_time, current_chunks = best_of(args.repeat, lambda: [chunker.chunk_text(text) for text in sample])
+        identical = current_chunks == [legacy_chunk_text(chunker, text, last_boundary=True) for text in sample]
+        ok = ok and identical
+        characters = sum(len(text) for text in sample)
+        report(f"Chunker, {label} ({len(sample)} texts, {characters / 1e6:.1f}M chars)", legacy_time, current_time,
+               identical, sum(len(chunks) for chunks in current_chunks), check="same as last-boundary reference")
+        print(f"  legacy chunks: {sum(len(chunks) for chunks in legacy_chunks)}")
+
+    return ok
+
+
+def bench_hash(args) -> bool:
+    """Benchmark the batched hash-embedding fallback against per-text list building on the ingest chunks.
+    Both must give bit-identical float32 vectors, so existing indexes stay valid."""
+    chunker = TextChunker(chunk_size=Config.CHUNK_SIZE, overlap=Config.CHUNK_OVERLAP, unit=Config.CHUNK_UNIT)
+    df = pd.read_csv(os.path.join(Config.DATA_DIR, Config.get_data_files()["processed_gita"]))
+    texts = [chunk for chunks in chunker.chunk_many(df['explanation'].dropna().astype(str).tolist()) for chunk in chunks]
+    texts = (texts * (45000 // len(texts) + 1))[:45000]
+
+    legacy_time, legacy = best_of(args.repeat, lambda: np.array([legacy_hash_embedding(text) for text in texts],
+                                                                 dtype=np.float32))
+    current_time, current = best_of(args.repeat, hash_embeddings, texts)
+    identical = (np.array_equal(legacy.view(np.uint32), current.view(np.uint32))
+                 and all(hash_embedding(text) == legacy_hash_embedding(text) for text in texts[:1000]))
+    report(f"Hash embeddings ({len(texts)} texts)", legacy_time, current_time, identical, len(texts))
+    return identical
+
+
+def bench_dedup(args) -> bool:
+    """Merge near-duplicates of the two Gita CSVs into a temporary FAISS store, as ingest does, and check
+    that a search filtered to the source of each merged duplicate still finds the passage"""
+    processor = DocumentProcessor()
+    dedup = NearDuplicateIndex(Config.INGEST_DEDUP_THRESHOLD or 0.85)
+    assigners = defaultdict(ChunkIdAssigner)
+    canonical, references = [], defaultdict(list)
+    for doc in processor.iter_all_files(workers=1, sources={"bhagavad_gita_qa", "processed_gita"}):
+        doc["id"] = assigners[doc["source"]].assign(doc)
+        target = dedup.check(doc["id"], doc["text"], doc["source"])
+        if target is not None:
+            references[target].append(source_reference(doc))
+        else:
+            canonical.append(doc)
+    embeddings = hash_embeddings([doc["text"] for doc in canonical])
+    for doc, embedding in zip(canonical, embeddings):
+        doc["embedding"] = embedding
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FaissVectorStore(index_file=os.path.join(tmp, "index.faiss"),
+                                 metadata_file=os.path.join(tmp, "metadata.json"))
+        store.add_documents(canonical, persist=False)
+        store.set_duplicate_references(references, persist=False)
+        positions = {doc["id"]: i for i, doc in enumerate(canonical)}
+
+        started = time.perf_counter()
+        checked = found = 0
+        for target, refs in references.items():
+            for ref in refs:
+                results = store.search(embeddings[positions[target]].tolist(), limit=5, source_filter=ref["source"])
+                checked += 1
+                found += any(ref in result["metadata"].get("duplicates", []) for result in results)
+        elapsed = time.perf_counter() - started
+
+    print(f"Filtered search for merged duplicates ({len(canonical)} chunks indexed)")
+    print(f"  merged:    {checked}")
+    print(f"  searches:  {elapsed * 1000:8.1f} ms")
+    print(f"  found by duplicate source: {found == checked} ({found} of {checked})")
+    return checked > 0 and found == checked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest code paths against their previous implementations")
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation; the best time is reported')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    subparsers.add_parser('csv', help='Vectorized CSV ingestion vs DataFrame.iterrows')
+    subparsers.add_parser('txt', help='Single-pass Kanda and Gita TXT scanners vs the split/while-loop parsers')
+    subparsers.add_parser('chunker', help='Last-boundary TextChunker vs the first-boundary, slice-per-window chunker')
+    subparsers.add_parser('hash', help='Batched NumPy hash embeddings vs per-text hex parsing')
+    subparsers.add_parser('dedup', help='Source-filtered search finds passages merged as near-duplicates')
+
+    args = parser.parse_args()
+    benchmarks = {
+        'csv': bench_csv,
+        'txt': bench_txt,
+        'chunker': bench_chunker,
+        'hash': bench_hash,
+        'dedup': bench_dedup,
+    }
+
+    if not benchmarks[args.benchmark](args):
+        print("Check failed: see the results above")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ class Config:
     # API Configuration
     MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "default_mistral_key")
     OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "default_openrouter_key")
+    OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api")  # point at a local stub server for testing
+    MISTRAL_BASE_URL = os.getenv("MISTRAL_BASE_URL", "https://api.mistral.ai")  # point at a local stub server for testing
     
     # Vector Database Configuration
     QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
@@ -17,12 +19,54 @@ class Config:
     # Text Processing Configuration
     CHUNK_SIZE = 400  # tokens
     CHUNK_OVERLAP = 100  # tokens (25% overlap)
+    CHUNK_UNIT = os.getenv("CHUNK_UNIT", "tokens")  # what CHUNK_SIZE/CHUNK_OVERLAP count: "tokens" or "chars"
     SIMILARITY_THRESHOLD = 0.65
     
+    # Query Configuration
+    QUERY_KEYWORDS_FILE = os.getenv("QUERY_KEYWORDS_FILE", "query_keywords.json")  # keyword sets for the domain gate
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))  # query embeddings kept in memory; 0 = off
+    QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))  # seconds; 0 = no expiry
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))  # generated answers kept in memory; 0 = off
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))  # seconds; 0 = no expiry
+    ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))  # cosine similarity for reusing the answer to a similar question; 0 = exact only
+    
+    # Ingest Configuration
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # chunks per embed/add batch
+    INGEST_PROGRESS_EVERY = int(os.getenv("INGEST_PROGRESS_EVERY", "10"))  # batches between progress reports
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))  # parse processes; 0 = one per CPU
+    INGEST_SHARD_BYTES = int(os.getenv("INGEST_SHARD_BYTES", str(512 * 1024)))  # min bytes per CSV/JSON shard
+    INGEST_MANIFEST_FILE = os.getenv("INGEST_MANIFEST_FILE", "ingest_manifest.json")  # file and chunk hashes of the indexed corpus
+    INGEST_CHECKPOINT_FILE = os.getenv("INGEST_CHECKPOINT_FILE", "ingest_checkpoint.json")  # progress of an unfinished ingest
+    INGEST_CHECKPOINT_EVERY = int(os.getenv("INGEST_CHECKPOINT_EVERY", "50"))  # batches between durable commits
+    CORPUS_ARTIFACT_FILE = os.getenv("CORPUS_ARTIFACT_FILE", "corpus.artifact")  # prebuilt parsed corpus (build_corpus.py)
+    INGEST_DEDUP_THRESHOLD = float(os.getenv("INGEST_DEDUP_THRESHOLD", "0.85"))  # MinHash similarity that merges chunks across sources; 0 = off
+    
     # Model Configuration
     EMBEDDING_MODEL = "mistral-embed"
+    EMBEDDING_USE_API = os.getenv("EMBEDDING_USE_API", "false").lower() == "true"  # Mistral embeddings instead of the hash fallback (ingest and queries)
+    EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "128"))  # inputs per /v1/embeddings request
+    EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "16000"))  # approximate tokens per request
+    EMBEDDING_MAX_REQUESTS_PER_SECOND = float(os.getenv("EMBEDDING_MAX_REQUESTS_PER_SECOND", "5"))  # provider quota; lowered on 429s
+    EMBEDDING_MAX_TOKENS_PER_MINUTE = float(os.getenv("EMBEDDING_MAX_TOKENS_PER_MINUTE", "500000"))  # provider quota
+    EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))  # embedding requests in flight
+    EMBEDDING_LOCAL_MODEL_FILE = os.getenv("EMBEDDING_LOCAL_MODEL_FILE", "local_embedder.npz")  # fitted local embedder (python -m services.local_embedder fit); used instead of the hash fallback when present
+    EMBEDDING_LOCAL_WORKERS = int(os.getenv("EMBEDDING_LOCAL_WORKERS", "1"))  # local encoding processes for large batches; 0 = one per CPU
+    EMBEDDING_CACHE_FILE = os.getenv("EMBEDDING_CACHE_FILE", "embedding_cache.sqlite")  # on-disk cache of API embeddings; empty = off
     LLM_MODEL = "mistralai/mixtral-8x7b-instruct"
     
+    # HTTP Configuration
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))  # keep-alive connections per provider
+    HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", "100"))  # per provider on the async query path
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # seconds
+    EMBEDDING_READ_TIMEOUT = float(os.getenv("EMBEDDING_READ_TIMEOUT", "30"))  # seconds to wait for an embeddings response
+    LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))  # seconds to wait for a completion response
+
+    # Resilience Configuration
+    REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "20"))  # seconds per question for embedding, search and generation; 0 = none
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # consecutive provider failures that open its circuit
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))  # seconds an open circuit fails fast before a trial call
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))  # send a duplicate completion request once this latency percentile has passed (e.g. 95); 0 = off
+    
     # Data Files
     DATA_DIR = "attached_assets"
     
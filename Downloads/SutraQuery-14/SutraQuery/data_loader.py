@@ -24,14 +24,15 @@ def main():
         # Initialize RAG service
         rag_service = RAGService()
         
-        # Check if we should force reload
-        force_reload = len(sys.argv) > 1 and sys.argv[1] == '--force'
+        # Check if we should force reload (--force syncs changed files, --full re-embeds everything)
+        full_rebuild = '--full' in sys.argv[1:]
+        force_reload = '--force' in sys.argv[1:] or full_rebuild
         
         if force_reload:
-            logger.info("Force reload requested")
+            logger.info("Full rebuild requested" if full_rebuild else "Force reload requested")
         
         # Initialize database
-        rag_service.initialize_database(force_reload=force_reload)
+        rag_service.initialize_database(force_reload=force_reload, full_rebuild=full_rebuild)
         
         # Get and display statistics
         stats = rag_service.get_database_stats()
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+import json
 import logging
 from services.rag_service import RAGService
+from services.async_runtime import iterate_sync
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +35,49 @@ def api_search():
             'error': 'An error occurred while processing your request'
         }), 500
 
+def _sse_event(event: str, data) -> str:
+    """Format one server-sent event; data is JSON so newlines in answer tokens survive"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@main_bp.route('/api/search/stream', methods=['GET', 'POST'])
+def api_search_stream():
+    """Streaming variant of /api/search over server-sent events: a "sources" event as soon as retrieval
+    finishes, then "token" events as the answer is generated, then "done". Questions that get no
+    generated answer produce a single "answer" event; failures produce an "error" event."""
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+        else:
+            data = request.args
+        question = (data.get('question') or '').strip()
+        source_filter = data.get('source_filter')
+        
+        if not question:
+            return jsonify({
+                'error': 'Question is required'
+            }), 400
+        
+        def generate():
+            # Flask closes this generator when the client disconnects, which closes the async
+            # stream on the event loop and aborts the provider request
+            events = iterate_sync(rag_service.astream_search_and_answer(question, source_filter))
+            try:
+                for event, payload in events:
+                    yield _sse_event(event, payload)
+            finally:
+                events.close()
+        
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in API search stream: {e}")
+        return jsonify({
+            'error': 'An error occurred while processing your request'
+        }), 500
+
 @main_bp.route('/api/verse/<chapter>/<verse>')
 def api_get_verse(chapter, verse):
     """API endpoint to get a specific verse"""
@@ -65,11 +110,13 @@ def api_initialize():
     try:
         data = request.get_json() or {}
         force_reload = data.get('force_reload', False)
+        full_rebuild = data.get('full_rebuild', False)
         
-        rag_service.initialize_database(force_reload=force_reload)
+        report = rag_service.initialize_database(force_reload=force_reload, full_rebuild=full_rebuild)
         
         return jsonify({
-            'message': 'Database initialized successfully'
+            'message': 'Database initialized successfully',
+            'report': report
         })
         
     except Exception as e:
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """LRU/TTL cache of generated answers for one index version.
+
+    Entries are keyed by (scope, normalized question), where the scope holds everything besides the
+    wording that changes the answer (source filter, verse reference). An exact miss falls back to the
+    most similar earlier question of the same scope whose embedding has at least similarity_threshold
+    cosine similarity. Question embeddings live in a preallocated matrix with one row per entry, so a
+    semantic lookup is a single matrix-vector product. Passing a different index version to any
+    method drops every entry."""
+
+    def __init__(self, max_size: int, ttl_seconds: Optional[float], similarity_threshold: float, dim: int = 1024):
+        self.max_size = max(0, max_size)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple[Dict[str, Any], float, int]]" = OrderedDict()
+        self._vectors = np.zeros((self.max_size, dim), dtype=np.float32)
+        # Scope id per row (-1 for free rows), so a semantic lookup only considers rows of the same scope
+        self._row_scopes = np.full(self.max_size, -1, dtype=np.int64)
+        self._row_keys: List[Optional[Tuple[Hashable, str]]] = [None] * self.max_size
+        self._scope_ids: Dict[Hashable, int] = {}
+        self._free_rows = list(range(self.max_size - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: str):
+        if version != self.version:
+            if self._entries:
+                logger.info(f"Index version changed, dropping {len(self._entries)} cached answers")
+                self.invalidations += 1
+            self._clear()
+            self.version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._vectors[:] = 0
+        self._row_scopes[:] = -1
+        self._row_keys = [None] * self.max_size
+        self._scope_ids.clear()
+        self._free_rows = list(range(self.max_size - 1, -1, -1))
+
+    def _remove(self, key: Tuple[Hashable, str]):
+        _, _, row = self._entries.pop(key)
+        self._row_scopes[row] = -1
+        self._row_keys[row] = None
+        self._free_rows.append(row)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.monotonic() - stored_at >= self.ttl_seconds
+
+    def get_exact(self, version: str, scope: Hashable, question: str) -> Optional[Dict[str, Any]]:
+        """Cached answer for exactly this normalized question, or None. A None is not counted as a
+        miss, since get_similar is expected to follow."""
+        with self._lock:
+            self._check_version(version)
+            key = (scope, question)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[1]):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[0]
+
+    def get_similar(self, version: str, scope: Hashable, embedding: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+        """Cached answer of the most similar earlier question of the same scope, or None (a miss).
+        Pass no embedding to count a miss without a semantic lookup."""
+        with self._lock:
+            self._check_version(version)
+            scope_id = self._scope_ids.get(scope)
+            if embedding is None or scope_id is None or self.similarity_threshold <= 0:
+                self.misses += 1
+                return None
+
+            query = self._unit(embedding)
+            scores = self._vectors @ query
+            scores[self._row_scopes != scope_id] = -np.inf
+            while True:
+                row = int(np.argmax(scores))
+                if scores[row] < self.similarity_threshold:
+                    self.misses += 1
+                    return None
+                key = self._row_keys[row]
+                answer, stored_at, _ = self._entries[key]
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    return answer
+                self._remove(key)
+                scores[row] = -np.inf
+
+    def put(self, version: str, scope: Hashable, question: str, embedding: Optional[np.ndarray], answer: Dict[str, Any]):
+        """Store an answer, evicting the least recently used entry when full. Without an embedding the
+        entry can only be found by an exact lookup."""
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            key = (scope, question)
+            if key in self._entries:
+                self._remove(key)
+            if not self._free_rows:
+                self._remove(next(iter(self._entries)))
+            row = self._free_rows.pop()
+            self._entries[key] = (answer, time.monotonic(), row)
+            self._row_keys[row] = key
+            if embedding is not None:
+                self._vectors[row] = self._unit(embedding)
+                self._row_scopes[row] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+            else:
+                self._vectors[row] = 0
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "invalidations": self.invalidations
+            }
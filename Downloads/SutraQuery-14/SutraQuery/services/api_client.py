@@ -1,92 +1,472 @@
 import requests
+import asyncio
+import hashlib
 import json
 import logging
+import os
+import threading
 import time
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
+import httpx
+import numpy as np
 from config import Config
+from services.embedding_cache import EmbeddingCache
+from services.http_session import AsyncPooledClient, shared_session, shared_async_client
+from services.local_embedder import LocalEmbedder
+from services.rate_limiter import shared_limiter, parse_retry_after
+from services.resilience import CircuitOpenError, Deadline, LatencyTracker, shared_breaker
+from utils.tokenizer import count_tokens
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_DIM = 1024
+
+# Value of each byte in hash-based embeddings. Kept in float64 so single embeddings match the original
+# per-byte int(hex, 16) / 255.0 exactly; matrices are rounded to float32 like every stored vector.
+_HASH_BYTE_VALUES = np.arange(256, dtype=np.float64) / 255.0
+_HASH_BYTE_VALUES_F32 = _HASH_BYTE_VALUES.astype(np.float32)
+_HASH_REPEATS = EMBEDDING_DIM // 16
+
+ANSWER_UNAVAILABLE_MESSAGE = "I'm unable to generate an answer right now because the AI service is temporarily unavailable. Please try again in a few moments, or check if there are relevant verses in the database that might help with your question."
+
+# 429 responses tolerated per request; each one lowers the shared rate before the retry
+MAX_RATE_LIMITED_RETRIES = 10
+
+# Duplicate completion requests are limited to this fraction of completions, so hedging cannot double the load on a struggling provider
+MAX_HEDGED_FRACTION = 0.1
+
+
+def hash_embedding(text: str) -> List[float]:
+    """Hash-based pseudo-embedding: the 16 bytes of the text's MD5 digest scaled to [0, 1] and
+    repeated to EMBEDDING_DIM values. Deterministic, but carries no meaning."""
+    digest = np.frombuffer(hashlib.md5(text.encode()).digest(), dtype=np.uint8)
+    return _HASH_BYTE_VALUES[digest].tolist() * _HASH_REPEATS
+
+
+def hash_embeddings(texts: List[str]) -> np.ndarray:
+    """hash_embedding for a batch of texts as a float32 matrix, built in one NumPy pass"""
+    digests = b"".join(hashlib.md5(text.encode()).digest() for text in texts)
+    values = _HASH_BYTE_VALUES_F32[np.frombuffer(digests, dtype=np.uint8).reshape(len(texts), 16)]
+    return np.tile(values, (1, _HASH_REPEATS))
+
+
+def _is_outage(error: Exception) -> bool:
+    """Whether a provider call failed because the provider is down or too slow (what the circuit breakers
+    count), as opposed to rejecting the request"""
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(error, (requests.HTTPError, httpx.HTTPStatusError)) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+
 class APIClient:
     def __init__(self):
         self.config = Config()
         self.mistral_api_key = self.config.MISTRAL_API_KEY
         self.openrouter_api_key = self.config.OPENROUTER_API_KEY
+        self.embeddings_url = f"{self.config.MISTRAL_BASE_URL.rstrip('/')}/v1/embeddings"
 
-    def get_embedding(self, text: str, use_api: bool = False, max_retries: int = 3) -> List[float]:
-        """Get embedding for text. By default uses hash-based for bulk loading, optionally uses API"""
-        # For bulk loading, use hash-based embeddings to avoid rate limits
+        # Every client of the same endpoint draws from one quota
+        self.limiter = shared_limiter(self.embeddings_url, self.config.EMBEDDING_MAX_REQUESTS_PER_SECOND,
+                                      self.config.EMBEDDING_MAX_TOKENS_PER_MINUTE)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        # Keep-alive connection pools with timeouts, one per provider and shared by every client
+        self.mistral_session = shared_session("mistral", self.config.HTTP_POOL_SIZE, self.config.HTTP_CONNECT_TIMEOUT,
+                                              self.config.EMBEDDING_READ_TIMEOUT)
+        self.openrouter_session = shared_session("openrouter", self.config.HTTP_POOL_SIZE,
+                                                 self.config.HTTP_CONNECT_TIMEOUT, self.config.LLM_READ_TIMEOUT)
+        # The async query path (a*-methods) runs on the background event loop with its own pools
+        self.mistral_async = shared_async_client("mistral", self.config.HTTP_ASYNC_MAX_CONNECTIONS,
+                                                 self.config.HTTP_CONNECT_TIMEOUT, self.config.EMBEDDING_READ_TIMEOUT)
+        self.openrouter_async = shared_async_client("openrouter", self.config.HTTP_ASYNC_MAX_CONNECTIONS,
+                                                    self.config.HTTP_CONNECT_TIMEOUT, self.config.LLM_READ_TIMEOUT)
+        # An outage of either provider opens its circuit, so requests fail fast instead of waiting on it
+        self.mistral_breaker = shared_breaker("mistral", self.config.CIRCUIT_FAILURE_THRESHOLD,
+                                              self.config.CIRCUIT_RESET_TIMEOUT)
+        self.openrouter_breaker = shared_breaker("openrouter", self.config.CIRCUIT_FAILURE_THRESHOLD,
+                                                 self.config.CIRCUIT_RESET_TIMEOUT)
+        self.completion_latency = LatencyTracker()
+        self.completions = 0
+        self.hedged_completions = 0
+        self.hedge_wins = 0
+        self.embedding_cache = self._open_embedding_cache()
+        self.local_embedder = self._load_local_embedder()
+
+    def _open_embedding_cache(self) -> Optional[EmbeddingCache]:
+        """On-disk cache of API embeddings, or None if disabled or unusable"""
+        path = self.config.EMBEDDING_CACHE_FILE
+        if not path:
+            return None
+        try:
+            return EmbeddingCache(path)
+        except Exception as e:
+            logger.error(f"Error opening embedding cache {path}, continuing without it: {e}")
+            return None
+
+    def _load_local_embedder(self) -> Optional[LocalEmbedder]:
+        """The fitted local embedder, if one is saved with the right dimension"""
+        embedder = LocalEmbedder.load(self.config.EMBEDDING_LOCAL_MODEL_FILE)
+        if embedder is not None and embedder.dim != EMBEDDING_DIM:
+            logger.error(f"Local embedder has {embedder.dim} dimensions, expected {EMBEDDING_DIM}; ignoring it")
+            return None
+        if embedder is not None:
+            logger.info(f"Loaded local embedder {embedder.fingerprint()}")
+        return embedder
+
+    def embedding_fingerprint(self) -> str:
+        """Which embeddings get_embedding(s) produce by default; vectors with different fingerprints are not comparable"""
+        if self.config.EMBEDDING_USE_API:
+            return f"mistral:{self.config.EMBEDDING_MODEL}"
+        if self.local_embedder is not None:
+            return self.local_embedder.fingerprint()
+        return "hash-md5"
+
+    def get_embedding(self, text: str, use_api: Optional[bool] = None, max_retries: int = 3) -> List[float]:
+        """Get embedding for text. Uses the API if use_api (default Config.EMBEDDING_USE_API), else the
+        local embedder if one is fitted, else hash-based"""
+        if use_api is None:
+            use_api = self.config.EMBEDDING_USE_API
+
+        # Without the API, embed locally to avoid rate limits
         if not use_api:
-            return self._get_embedding_openrouter(text)
-        
-        # Only use API when specifically requested
-        for attempt in range(max_retries):
-            try:
-                url = "https://api.mistral.ai/v1/embeddings"
-                headers = {
-                    "Authorization": f"Bearer {self.mistral_api_key}",
-                    "Content-Type": "application/json"
-                }
-
-                data = {
-                    "model": self.config.EMBEDDING_MODEL,
-                    "input": [text]
-                }
-
-                response = requests.post(url, headers=headers, json=data)
-                
-                if response.status_code == 429:  # Rate limit hit
-                    wait_time = (2 ** attempt) * 5  # Exponential backoff: 5s, 10s, 20s
-                    logger.warning(f"Rate limit hit, waiting {wait_time}s before retry {attempt + 1}/{max_retries}")
-                    time.sleep(wait_time)
-                    continue
-                    
-                response.raise_for_status()
-                result = response.json()
-                return result["data"][0]["embedding"]
+            return self._embed_offline_one(text)
 
-            except Exception as e:
-                if attempt == max_retries - 1:  # Last attempt
-                    logger.error(f"Error getting embedding from Mistral after {max_retries} attempts: {e}")
-                    # Fallback to hash-based embedding
-                    return self._get_embedding_openrouter(text)
-                else:
-                    logger.warning(f"Attempt {attempt + 1} failed, retrying: {e}")
-                    time.sleep(2)  # Wait 2 seconds before retry
-        
-        # Fallback if all retries failed
+        # A batch of one shares the rate limiter; falls back to the hash-based embedding if the API fails
+        return self.get_embeddings([text], use_api=True, max_retries=max_retries)[0].tolist()
+
+    async def aget_embedding(self, text: str, use_api: Optional[bool] = None, max_retries: int = 3,
+                             deadline: Optional[Deadline] = None) -> List[float]:
+        """get_embedding for the async query path (run on the background event loop)"""
+        if use_api is None:
+            use_api = self.config.EMBEDDING_USE_API
+        if not use_api:
+            return self._embed_offline_one(text)
+        return (await self.aget_embeddings([text], use_api=True, max_retries=max_retries, deadline=deadline))[0].tolist()
+
+    def _embed_offline_one(self, text: str) -> List[float]:
+        if self.local_embedder is not None:
+            return self.local_embedder.encode([text])[0].tolist()
         return self._get_embedding_openrouter(text)
 
-    def _get_embedding_openrouter(self, text: str) -> List[float]:
-        """Fallback embedding using OpenRouter (using chat completion with a simple prompt for similarity)"""
+    def _embed_offline(self, texts: List[str]) -> np.ndarray:
+        if self.local_embedder is not None:
+            return self._get_embeddings_local(texts)
+        return self._get_embeddings_hashed(texts)
+
+    def get_embeddings(self, texts: List[str], use_api: Optional[bool] = None, fallback: bool = True,
+                       max_retries: int = 3) -> np.ndarray:
+        """Embed a list of texts and return a float32 matrix with one row per text.
+        With the API, texts are packed into requests of at most EMBEDDING_BATCH_MAX_ITEMS inputs and
+        EMBEDDING_BATCH_MAX_TOKENS approximate tokens, and up to EMBEDDING_CONCURRENCY requests are kept
+        in flight under the shared rate limiter. A request the API rejects is split in half and
+        retried until the offending input is isolated. Rows that still fail get the hash-based embedding
+        if fallback is set, otherwise NaN, so bulk loads can drop and retry them later."""
+        if use_api is None:
+            use_api = self.config.EMBEDDING_USE_API
+        if not use_api:
+            return self._embed_offline(texts)
+
+        embeddings, missing = self._start_api_embeddings(texts)
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fetched = np.full((len(missing), EMBEDDING_DIM), np.nan, dtype=np.float32)
+            token_counts = [count_tokens(text) for text in missing_texts]
+            ranges = list(self._pack_embedding_batches(token_counts))
+            if len(ranges) > 1 and self.config.EMBEDDING_CONCURRENCY > 1:
+                executor = self._embedding_executor()
+                futures = [executor.submit(self._embed_range, missing_texts, token_counts, start, end, fetched, max_retries)
+                           for start, end in ranges]
+                for future in futures:
+                    future.result()
+            else:
+                for start, end in ranges:
+                    self._embed_range(missing_texts, token_counts, start, end, fetched, max_retries)
+            self._merge_fetched(embeddings, missing, missing_texts, fetched)
+        return self._finish_api_embeddings(texts, embeddings, fallback)
+
+    async def aget_embeddings(self, texts: List[str], use_api: Optional[bool] = None, fallback: bool = True,
+                              max_retries: int = 3, deadline: Optional[Deadline] = None) -> np.ndarray:
+        """get_embeddings for the async query path: the same packing, cache, rate limiter and fallback,
+        with up to EMBEDDING_CONCURRENCY requests awaited concurrently on the background event loop.
+        Request timeouts and retries are cut short by the deadline, if one is given. The on-disk cache
+        is read and written in a worker thread, so its SQLite commits (and its lock, held by bulk
+        ingest while it writes) never block the event loop."""
+        if use_api is None:
+            use_api = self.config.EMBEDDING_USE_API
+        if not use_api:
+            return self._embed_offline(texts)
+
+        embeddings, missing = await asyncio.to_thread(self._start_api_embeddings, texts)
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fetched = np.full((len(missing), EMBEDDING_DIM), np.nan, dtype=np.float32)
+            token_counts = [count_tokens(text) for text in missing_texts]
+            in_flight = asyncio.Semaphore(max(1, self.config.EMBEDDING_CONCURRENCY))
+
+            async def embed_range(start: int, end: int):
+                async with in_flight:
+                    await self._aembed_range(missing_texts, token_counts, start, end, fetched, max_retries, deadline)
+
+            await asyncio.gather(*(embed_range(start, end) for start, end in self._pack_embedding_batches(token_counts)))
+            await asyncio.to_thread(self._merge_fetched, embeddings, missing, missing_texts, fetched)
+        return self._finish_api_embeddings(texts, embeddings, fallback)
+
+    def _start_api_embeddings(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """NaN matrix for texts with cached rows filled in, and the indices still to embed"""
+        embeddings = np.full((len(texts), EMBEDDING_DIM), np.nan, dtype=np.float32)
+        missing = list(range(len(texts)))
+        if self.embedding_cache is not None:
+            missing = self._read_embedding_cache(texts, embeddings)
+        return embeddings, missing
+
+    def _merge_fetched(self, embeddings: np.ndarray, missing: List[int], missing_texts: List[str], fetched: np.ndarray):
+        embeddings[missing] = fetched
+        if self.embedding_cache is not None:
+            self._write_embedding_cache(missing_texts, fetched)
+
+    def _finish_api_embeddings(self, texts: List[str], embeddings: np.ndarray, fallback: bool) -> np.ndarray:
+        """Report rows the API did not return and give them hash-based embeddings if fallback is set"""
+        failed = np.flatnonzero(np.isnan(embeddings).any(axis=1))
+        if len(failed):
+            logger.error(f"No API embedding for {len(failed)} of {len(texts)} texts"
+                         f"{', using hash-based embeddings' if fallback else ''}")
+            if fallback:
+                embeddings[failed] = self._get_embeddings_hashed([texts[i] for i in failed])
+        return embeddings
+
+    def _read_embedding_cache(self, texts: List[str], embeddings: np.ndarray) -> List[int]:
+        """Fill embeddings with cached rows and return the indices of the texts still to embed"""
         try:
-            # Since OpenRouter embedding API is not working properly, 
-            # let's use a simple fallback approach for now
-            # This is a temporary solution until API issues are resolved
+            cached, hits = self.embedding_cache.get_many(self.config.EMBEDDING_MODEL, texts)
+        except Exception as e:
+            logger.error(f"Error reading embedding cache: {e}")
+            return list(range(len(texts)))
+        missing = []
+        for i, embedding in enumerate(cached):
+            if embedding is not None and embedding.shape[0] == EMBEDDING_DIM:
+                embeddings[i] = embedding
+            else:
+                missing.append(i)
+        if hits:
+            logger.info(f"Embedding cache: {len(texts) - len(missing)} of {len(texts)} texts cached")
+        return missing
+
+    def _write_embedding_cache(self, texts: List[str], embeddings: np.ndarray):
+        """Store the rows the API returned; failed (NaN) rows are not cached"""
+        ok = ~np.isnan(embeddings).any(axis=1)
+        if not ok.any():
+            return
+        try:
+            self.embedding_cache.put_many(self.config.EMBEDDING_MODEL,
+                                          [text for text, keep in zip(texts, ok) if keep], embeddings[ok])
+        except Exception as e:
+            logger.error(f"Error writing embedding cache: {e}")
+
+    def embedding_stats(self) -> Dict[str, Any]:
+        """Request, rate-limit and wait counters of the shared embedding rate limiter, and embedding cache stats"""
+        stats = self.limiter.stats()
+        if self.embedding_cache is not None:
+            try:
+                stats["cache"] = self.embedding_cache.stats()
+            except Exception as e:
+                logger.error(f"Error reading embedding cache stats: {e}")
+        return stats
 
-            # For now, create a simple hash-based pseudo-embedding
-            import hashlib
-            text_hash = hashlib.md5(text.encode()).hexdigest()
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Circuit breaker state per provider and hedged completion counters"""
+        return {
+            "circuits": {
+                "mistral": self.mistral_breaker.stats(),
+                "openrouter": self.openrouter_breaker.stats()
+            },
+            "hedging": {
+                "percentile": self.config.LLM_HEDGE_PERCENTILE,
+                "delay_seconds": self._hedge_delay(),
+                "completions": self.completions,
+                "hedged_completions": self.hedged_completions,
+                "hedge_wins": self.hedge_wins
+            }
+        }
 
-            # Convert hash to a simple 1024-dimensional vector
-            embedding = []
-            for i in range(0, len(text_hash), 2):
-                hex_val = text_hash[i:i+2]
-                embedding.append(int(hex_val, 16) / 255.0)
+    def http_stats(self) -> Dict[str, Any]:
+        """Request, connection reuse and timeout counters of each provider's connection pool"""
+        return {
+            "mistral": self.mistral_session.stats(),
+            "openrouter": self.openrouter_session.stats(),
+            "mistral_async": self.mistral_async.stats(),
+            "openrouter_async": self.openrouter_async.stats()
+        }
 
-            # Pad to 1024 dimensions to match expected embedding size
-            while len(embedding) < 1024:
-                embedding.extend(embedding[:min(len(embedding), 1024 - len(embedding))])
+    def _embedding_executor(self) -> ThreadPoolExecutor:
+        """Worker threads that keep embedding requests in flight, created on first use"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.config.EMBEDDING_CONCURRENCY,
+                                                    thread_name_prefix="embeddings")
+            return self._executor
 
-            # Truncate to exactly 1024 if needed
-            embedding = embedding[:1024]
+    def _pack_embedding_batches(self, token_counts: List[int]) -> Iterator[Tuple[int, int]]:
+        """Yield [start, end) ranges of consecutive texts that fit the per-request item and token limits"""
+        max_items = self.config.EMBEDDING_BATCH_MAX_ITEMS
+        max_tokens = self.config.EMBEDDING_BATCH_MAX_TOKENS
+        start = 0
+        tokens = 0
+        for i, text_tokens in enumerate(token_counts):
+            if i > start and (i - start >= max_items or tokens + text_tokens > max_tokens):
+                yield start, i
+                start, tokens = i, 0
+            tokens += text_tokens
+        if start < len(token_counts):
+            yield start, len(token_counts)
 
-            logger.warning("Using fallback hash-based embedding due to API issues")
-            return embedding
+    def _embed_range(self, texts: List[str], token_counts: List[int], start: int, end: int,
+                     embeddings: np.ndarray, max_retries: int):
+        """Fill embeddings[start:end] from one API request, splitting the range if the API rejects it"""
+        try:
+            embeddings[start:end] = self._request_embeddings(texts[start:end], sum(token_counts[start:end]),
+                                                             max_retries)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status is not None and 400 <= status < 500 and status != 429 and end - start > 1:
+                middle = (start + end) // 2
+                logger.warning(f"Embedding request for {end - start} texts rejected ({status}), splitting it")
+                self._embed_range(texts, token_counts, start, middle, embeddings, max_retries)
+                self._embed_range(texts, token_counts, middle, end, embeddings, max_retries)
+            else:
+                logger.error(f"Error getting embeddings for {end - start} texts from Mistral: {e}")
+        except Exception as e:
+            logger.error(f"Error getting embeddings for {end - start} texts from Mistral: {e}")
 
+    async def _aembed_range(self, texts: List[str], token_counts: List[int], start: int, end: int,
+                            embeddings: np.ndarray, max_retries: int, deadline: Optional[Deadline] = None):
+        """_embed_range for the async path"""
+        try:
+            embeddings[start:end] = await self._arequest_embeddings(texts[start:end], sum(token_counts[start:end]),
+                                                                    max_retries, deadline)
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if 400 <= status < 500 and status != 429 and end - start > 1:
+                middle = (start + end) // 2
+                logger.warning(f"Embedding request for {end - start} texts rejected ({status}), splitting it")
+                await self._aembed_range(texts, token_counts, start, middle, embeddings, max_retries, deadline)
+                await self._aembed_range(texts, token_counts, middle, end, embeddings, max_retries, deadline)
+            else:
+                logger.error(f"Error getting embeddings for {end - start} texts from Mistral: {e}")
         except Exception as e:
-            logger.error(f"Error in fallback embedding: {e}")
-            raise
+            logger.error(f"Error getting embeddings for {end - start} texts from Mistral: {e}")
+
+    def _embedding_request(self, texts: List[str]) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """Headers and JSON body of a /v1/embeddings request"""
+        headers = {
+            "Authorization": f"Bearer {self.mistral_api_key}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": self.config.EMBEDDING_MODEL,
+            "input": texts
+        }
+        return headers, data
+
+    @staticmethod
+    def _parse_embeddings(payload: Dict[str, Any], count: int) -> np.ndarray:
+        items = sorted(payload["data"], key=lambda item: item.get("index", 0))
+        if len(items) != count:
+            raise ValueError(f"expected {count} embeddings, got {len(items)}")
+        return np.array([item["embedding"] for item in items], dtype=np.float32)
+
+    def _request_embeddings(self, texts: List[str], tokens: int, max_retries: int) -> np.ndarray:
+        """One /v1/embeddings request under the rate limiter. A 429 lowers the shared rate and honours
+        Retry-After (up to MAX_RATE_LIMITED_RETRIES times); transient errors are retried max_retries times.
+        Other client errors are raised immediately, since retrying the same input cannot succeed, and so is
+        CircuitOpenError while Mistral's circuit is open."""
+        headers, data = self._embedding_request(texts)
+
+        attempt = 0
+        rate_limited = 0
+        while True:
+            self.limiter.acquire(tokens)
+            try:
+                with self.mistral_breaker.guard(_is_outage) as call:
+                    response = self.mistral_session.post(self.embeddings_url, headers=headers, json=data)
+
+                    if response.status_code == 429 and rate_limited < MAX_RATE_LIMITED_RETRIES:
+                        # Rate limiting says nothing about an outage; retried without touching the circuit
+                        call.neutral = True
+                        rate_limited += 1
+                        self.limiter.on_rate_limited(parse_retry_after(response.headers.get("Retry-After")))
+                        continue
+
+                    response.raise_for_status()
+                embeddings = self._parse_embeddings(response.json(), len(texts))
+                self.limiter.on_success()
+                return embeddings
+
+            except Exception as e:
+                rejected = (isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code < 500
+                            or isinstance(e, CircuitOpenError))
+                attempt += 1
+                if rejected or attempt >= max_retries:
+                    raise
+                logger.warning(f"Attempt {attempt} failed, retrying: {e}")
+                time.sleep(2)
+
+    async def _arequest_embeddings(self, texts: List[str], tokens: int, max_retries: int,
+                                   deadline: Optional[Deadline] = None) -> np.ndarray:
+        """_request_embeddings for the async path; waits for the rate limiter without blocking the loop.
+        With a deadline, request timeouts are capped to the time left and no retry is started without
+        time for it."""
+        headers, data = self._embedding_request(texts)
+
+        attempt = 0
+        rate_limited = 0
+        while True:
+            await self.limiter.acquire_async(tokens)
+            try:
+                with self.mistral_breaker.guard(_is_outage) as call:
+                    response = await self.mistral_async.post(self.embeddings_url, headers=headers, json=data,
+                                                             timeout=self._request_timeout(self.mistral_async, deadline))
+
+                    if response.status_code == 429 and rate_limited < MAX_RATE_LIMITED_RETRIES:
+                        # Rate limiting says nothing about an outage; retried without touching the circuit
+                        call.neutral = True
+                        rate_limited += 1
+                        self.limiter.on_rate_limited(parse_retry_after(response.headers.get("Retry-After")))
+                        continue
+
+                    response.raise_for_status()
+                embeddings = self._parse_embeddings(response.json(), len(texts))
+                self.limiter.on_success()
+                return embeddings
+
+            except Exception as e:
+                rejected = (isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500
+                            or isinstance(e, CircuitOpenError))
+                attempt += 1
+                if rejected or attempt >= max_retries or (deadline is not None and deadline.expires_within(2)):
+                    raise
+                logger.warning(f"Attempt {attempt} failed, retrying: {e}")
+                await asyncio.sleep(2)
+
+    def _get_embedding_openrouter(self, text: str) -> List[float]:
+        """Fallback embedding using OpenRouter (using chat completion with a simple prompt for similarity).
+        OpenRouter embeddings are not working properly, so this is the hash-based pseudo-embedding."""
+        return hash_embedding(text)
+
+    def _get_embeddings_local(self, texts: List[str]) -> np.ndarray:
+        """Local TF-IDF embeddings, spread over EMBEDDING_LOCAL_WORKERS processes for large batches"""
+        workers = self.config.EMBEDDING_LOCAL_WORKERS
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return self.local_embedder.encode(texts, workers=workers)
+
+    def _get_embeddings_hashed(self, texts: List[str]) -> np.ndarray:
+        """Hash-based pseudo-embeddings for a batch of texts as one float32 matrix"""
+        logger.debug(f"Using hash-based embeddings for {len(texts)} texts")
+        return hash_embeddings(texts)
 
     def generate_answer(self, question: str, context: str) -> str:
         """Generate answer using Mixtral 8x7B Instruct via OpenRouter for humanized responses"""
@@ -96,18 +476,54 @@ class APIClient:
         except Exception as e:
             logger.error(f"Error generating answer with OpenRouter: {e}")
             # Return informative error message if OpenRouter fails
-            return "I'm unable to generate an answer right now because the AI service is temporarily unavailable. Please try again in a few moments, or check if there are relevant verses in the database that might help with your question."
+            return ANSWER_UNAVAILABLE_MESSAGE
 
-    def _generate_answer_openrouter(self, question: str, context: str) -> str:
-        """Generate humanized answer using Mixtral 8x7B Instruct via OpenRouter"""
+    async def agenerate_answer(self, question: str, context: str, deadline: Optional[Deadline] = None) -> str:
+        """generate_answer for the async query path (run on the background event loop); the request
+        timeout is capped to the deadline, if one is given"""
         try:
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.openrouter_api_key}",
-                "Content-Type": "application/json"
-            }
+            return await self._agenerate_answer_openrouter(question, context, deadline)
+        except Exception as e:
+            logger.error(f"Error generating answer with OpenRouter: {e}")
+            return ANSWER_UNAVAILABLE_MESSAGE
+
+    async def astream_answer(self, question: str, context: str, deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+        """Stream the answer from OpenRouter piece by piece as the model generates it.
+        Errors are raised to the caller; closing the iterator closes the provider connection.
+        With a deadline, the connect timeout and the wait for each piece are capped to the time left
+        when the stream starts."""
+        url, headers, data = self._completion_request(question, context)
+        data["stream"] = True
+        with self.openrouter_breaker.guard(_is_outage):
+            async with self.openrouter_async.stream_post(url, headers=headers, json=data,
+                                                         timeout=self._request_timeout(self.openrouter_async, deadline)) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                # Server-sent events: "data: {json}" lines, ": comment" keep-alives and a final "data: [DONE]"
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        return
+                    chunk = json.loads(payload)
+                    if "error" in chunk:
+                        raise RuntimeError(f"OpenRouter stream error: {chunk['error']}")
+                    choices = chunk.get("choices") or [{}]
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+
+    def _completion_request(self, question: str, context: str) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """URL, headers and JSON body of the OpenRouter chat completion for a question and its context"""
+        url = f"{self.config.OPENROUTER_BASE_URL.rstrip('/')}/v1/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {self.openrouter_api_key}",
+            "Content-Type": "application/json"
+        }
 
-            system_prompt = """You are a knowledgeable assistant for Hindu religious texts including the Bhagavad Gita, Ramayana, Mahabharata, and Yoga Sutras.
+        system_prompt = """You are a knowledgeable assistant for Hindu religious texts including the Bhagavad Gita, Ramayana, Mahabharata, and Yoga Sutras.
 
 INSTRUCTIONS:
 - Answer questions directly with facts from Hindu religious texts
@@ -119,29 +535,91 @@ INSTRUCTIONS:
 
 Your goal is to provide direct factual answers about Hindu texts, teachings, characters, and concepts."""
 
-            user_prompt = f"""Sacred Text Context:
+        user_prompt = f"""Sacred Text Context:
 {context}
 
 Question: {question}
 
 Answer directly with facts only, without mentioning sources or locations."""
 
-            data = {
-                "model": self.config.LLM_MODEL,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": 0.4,
-                "max_tokens": 1200
-            }
+        data = {
+            "model": self.config.LLM_MODEL,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.4,
+            "max_tokens": 1200
+        }
 
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
+        return url, headers, data
+
+    def _generate_answer_openrouter(self, question: str, context: str) -> str:
+        """Generate humanized answer using Mixtral 8x7B Instruct via OpenRouter"""
+        try:
+            url, headers, data = self._completion_request(question, context)
+            with self.openrouter_breaker.guard(_is_outage):
+                response = self.openrouter_session.post(url, headers=headers, json=data)
+                response.raise_for_status()
 
             result = response.json()
             return result["choices"][0]["message"]["content"]
 
         except Exception as e:
             logger.error(f"Error generating answer with OpenRouter: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def _agenerate_answer_openrouter(self, question: str, context: str, deadline: Optional[Deadline] = None) -> str:
+        """_generate_answer_openrouter for the async path. With LLM_HEDGE_PERCENTILE set, a completion still
+        running after that percentile of recent completion latencies gets a duplicate request (within
+        MAX_HEDGED_FRACTION of completions), and whichever answers first wins; the other is cancelled."""
+        url, headers, data = self._completion_request(question, context)
+        self.completions += 1
+        first = asyncio.ensure_future(self._acomplete(url, headers, data, deadline))
+        pending = {first}
+        try:
+            delay = self._hedge_delay()
+            if delay is not None and self.hedged_completions < MAX_HEDGED_FRACTION * self.completions:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    self.hedged_completions += 1
+                    pending.add(asyncio.ensure_future(self._acomplete(url, headers, data, deadline)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _acomplete(self, url: str, headers: Dict[str, str], data: Dict[str, Any],
+                         deadline: Optional[Deadline]) -> str:
+        """One completion request under the OpenRouter circuit breaker; successful latencies feed hedging"""
+        started = time.monotonic()
+        with self.openrouter_breaker.guard(_is_outage):
+            response = await self.openrouter_async.post(url, headers=headers, json=data,
+                                                        timeout=self._request_timeout(self.openrouter_async, deadline))
+            response.raise_for_status()
+        answer = response.json()["choices"][0]["message"]["content"]
+        self.completion_latency.record(time.monotonic() - started)
+        return answer
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds after which a completion gets a duplicate request; None while hedging is off or there
+        are too few recent latencies"""
+        if self.config.LLM_HEDGE_PERCENTILE <= 0:
+            return None
+        return self.completion_latency.percentile(self.config.LLM_HEDGE_PERCENTILE)
+
+    @staticmethod
+    def _request_timeout(client: AsyncPooledClient, deadline: Optional[Deadline]) -> httpx.Timeout:
+        """The client's timeouts, capped to the time left before the deadline"""
+        if deadline is None or deadline.remaining() is None:
+            return client.timeout
+        return httpx.Timeout(deadline.timeout(client.timeout.read), connect=deadline.timeout(client.timeout.connect))
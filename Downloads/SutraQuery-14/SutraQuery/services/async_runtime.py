@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Awaitable, Coroutine, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide event loop that runs all async provider and vector store I/O, started on first
+    use in a daemon thread. Async clients are bound to this loop, so every coroutine of the async query
+    path must run on it: sync callers use run_sync, callers on another loop await submit."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            threading.Thread(target=run, name="async-io", daemon=True).start()
+            started.wait()
+            _loop = loop
+            logger.info("Started background event loop")
+        return _loop
+
+
+def in_background_loop() -> bool:
+    """Whether the caller is running on the background loop's thread"""
+    try:
+        return asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        return False
+
+
+def run_sync(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the background loop and block the calling thread until it finishes"""
+    if in_background_loop():
+        coro.close()
+        raise RuntimeError("run_sync called from the background loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, background_loop()).result(timeout)
+
+
+def submit(coro: Coroutine) -> Awaitable:
+    """Run a coroutine on the background loop and return an awaitable for the caller's own loop"""
+    if in_background_loop():
+        return coro
+    return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, background_loop()))
+
+
+def iterate_sync(iterator: AsyncIterator, timeout: Optional[float] = None) -> Iterator:
+    """Consume an async iterator on the background loop from a sync caller, one item at a time.
+    Closing the returned generator early (e.g. when a streaming client disconnects) closes the async
+    iterator on the loop, which cancels whatever it was awaiting."""
+    loop = background_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(iterator.__anext__(), loop).result(timeout)
+            except StopAsyncIteration:
+                return
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(aclose(), loop).result(timeout)
+            except Exception as e:
+                logger.warning(f"Error closing async iterator: {e}")
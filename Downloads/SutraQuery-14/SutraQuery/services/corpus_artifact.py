@@ -0,0 +1,227 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+import numpy as np
+from services.ingest_manifest import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the column layout changes; artifacts with another version are ignored
+ARTIFACT_SCHEMA_VERSION = 1
+
+_MAGIC = b"SQCORPUS"
+_ALIGN = 64
+
+# Chunk fields stored as plain string columns (unique per chunk) and as dictionary-encoded columns
+# (the same few values repeat across chunks, e.g. the verse fields of every chunk of a verse)
+_PLAIN_COLUMNS = ("text", "metadata")
+_DICTIONARY_COLUMNS = ("source", "chapter", "verse", "sanskrit", "translation", "explanation")
+
+
+def _encode_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 blob and int64 offsets (len + 1) for a list of strings"""
+    encoded = [value.encode('utf-8', 'surrogatepass') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _encode_dictionary(values: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """int32 codes and the distinct values in first-seen order"""
+    index: Dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int32, count=len(values))
+    return codes, list(index)
+
+
+def write_artifact(path: str, documents: List[Dict[str, Any]], sources: Dict[str, Dict[str, Any]]):
+    """Write chunk records and their source descriptions as a single memory-mappable columnar file.
+
+    Layout: magic, header length, JSON header (schema, sources, array table), then 64-byte aligned
+    arrays. The file is written to a temp path and renamed, so readers never see a partial artifact."""
+    arrays: Dict[str, np.ndarray] = {}
+    for column in _PLAIN_COLUMNS:
+        values = [json.dumps(doc.get(column, {}), ensure_ascii=False) if column == "metadata" else doc.get(column, "")
+                  for doc in documents]
+        arrays[f"{column}.data"], arrays[f"{column}.offsets"] = _encode_strings(values)
+    for column in _DICTIONARY_COLUMNS:
+        codes, dictionary = _encode_dictionary([doc.get(column, "") for doc in documents])
+        arrays[f"{column}.codes"] = codes
+        arrays[f"{column}.dict.data"], arrays[f"{column}.dict.offsets"] = _encode_strings(dictionary)
+
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        table[name] = {"dtype": array.dtype.str, "offset": offset, "count": int(array.size)}
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({
+        "schema_version": ARTIFACT_SCHEMA_VERSION,
+        "created_at": time.time(),
+        "rows": len(documents),
+        "sources": sources,
+        "arrays": table
+    }).encode('utf-8')
+    data_start = -(-(len(_MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + table[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _StringColumn:
+    """Zero-copy view of a UTF-8 blob and its offsets"""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, row: int) -> str:
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode('utf-8', 'surrogatepass')
+
+
+class _DictionaryColumn:
+    """Codes into a string dictionary; each distinct value is decoded once and then shared"""
+
+    def __init__(self, codes: np.ndarray, dictionary: _StringColumn):
+        self.codes = codes
+        self.dictionary = dictionary
+        self._values: List[Optional[str]] = [None] * len(dictionary)
+
+    def get(self, row: int) -> str:
+        code = self.codes[row]
+        value = self._values[code]
+        if value is None:
+            value = self._values[code] = self.dictionary.get(code)
+        return value
+
+
+class CorpusArtifact:
+    """Read side of a prebuilt corpus: chunk records by source, memory-mapped from disk"""
+
+    def __init__(self, path: str, header: Dict[str, Any], buffer: mmap.mmap, data_start: int):
+        self.path = path
+        self.header = header
+        self.sources: Dict[str, Dict[str, Any]] = header["sources"]
+        self._buffer = buffer
+
+        def array(name: str) -> np.ndarray:
+            spec = header["arrays"][name]
+            return np.frombuffer(buffer, dtype=np.dtype(spec["dtype"]), count=spec["count"],
+                                 offset=data_start + spec["offset"])
+
+        self._plain = {column: _StringColumn(array(f"{column}.data"), array(f"{column}.offsets"))
+                       for column in _PLAIN_COLUMNS}
+        self._dictionary = {
+            column: _DictionaryColumn(array(f"{column}.codes"),
+                                      _StringColumn(array(f"{column}.dict.data"), array(f"{column}.dict.offsets")))
+            for column in _DICTIONARY_COLUMNS
+        }
+
+    @classmethod
+    def load(cls, path: str) -> Optional["CorpusArtifact"]:
+        """Open an artifact; returns None if it is missing, unreadable or of another schema version"""
+        try:
+            if not os.path.exists(path):
+                return None
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if buffer[:len(_MAGIC)] != _MAGIC:
+                raise ValueError("not a corpus artifact")
+            header_length = struct.unpack("<Q", buffer[len(_MAGIC):len(_MAGIC) + 8])[0]
+            header_end = len(_MAGIC) + 8 + header_length
+            header = json.loads(buffer[len(_MAGIC) + 8:header_end].decode('utf-8'))
+            if header.get("schema_version") != ARTIFACT_SCHEMA_VERSION:
+                logger.warning(f"Ignoring corpus artifact {path} with schema version {header.get('schema_version')}")
+                return None
+            artifact = cls(path, header, buffer, -(-header_end // _ALIGN) * _ALIGN)
+            logger.info(f"Opened corpus artifact {path} with {len(artifact)} chunks from {len(artifact.sources)} sources")
+            return artifact
+        except Exception as e:
+            logger.warning(f"Could not open corpus artifact {path}: {e}")
+            return None
+
+    def __len__(self) -> int:
+        return self.header["rows"]
+
+    def matches(self, source_name: str, sha256: str, parse_fingerprint: str) -> bool:
+        """Whether the artifact holds a source parsed from the same bytes with the same parser settings"""
+        entry = self.sources.get(source_name)
+        return bool(entry) and entry.get("sha256") == sha256 and entry.get("parse") == parse_fingerprint
+
+    def iter_source(self, source_name: str) -> Iterator[Dict[str, Any]]:
+        """Yield the chunk records of one source, identical to what DocumentProcessor produces"""
+        start, end = self.sources[source_name]["rows"]
+        text, metadata = self._plain["text"], self._plain["metadata"]
+        dictionary = self._dictionary
+        for row in range(start, end):
+            yield {
+                "text": text.get(row),
+                "source": dictionary["source"].get(row),
+                "chapter": dictionary["chapter"].get(row),
+                "verse": dictionary["verse"].get(row),
+                "sanskrit": dictionary["sanskrit"].get(row),
+                "translation": dictionary["translation"].get(row),
+                "explanation": dictionary["explanation"].get(row),
+                "metadata": json.loads(metadata.get(row))
+            }
+
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        """Yield every chunk record in source order"""
+        for source_name in self.sources:
+            yield from self.iter_source(source_name)
+
+
+def build_artifact(doc_processor, path: str, workers: Optional[int] = None) -> Dict[str, Any]:
+    """Parse and chunk every configured source and write the result as a corpus artifact"""
+    started = time.monotonic()
+    parse_fingerprint = doc_processor.parse_fingerprint()
+    documents: List[Dict[str, Any]] = []
+    sources: Dict[str, Dict[str, Any]] = {}
+
+    source_files = dict(doc_processor.iter_source_files())
+    for source_name, filepath in source_files.items():
+        sources[source_name] = {"path": filepath, "sha256": file_sha256(filepath), "parse": parse_fingerprint}
+
+    # Sources are streamed in configuration order, so each one occupies a contiguous row range
+    counts: Dict[str, int] = {source_name: 0 for source_name in source_files}
+    failed: Set[str] = set()
+    for doc in doc_processor.iter_all_files(workers=workers, failed=failed):
+        counts[doc["source"]] += 1
+        documents.append(doc)
+    # A file that failed to parse is left out, so ingest parses it instead of trusting a partial copy
+    if failed:
+        logger.warning(f"Leaving {len(failed)} source(s) that failed to parse out of the artifact: {sorted(failed)}")
+        documents = [doc for doc in documents if doc["source"] not in failed]
+        for source_name in failed:
+            del counts[source_name]
+            del sources[source_name]
+    row = 0
+    for source_name, count in counts.items():
+        sources[source_name]["rows"] = [row, row + count]
+        row += count
+
+    write_artifact(path, documents, sources)
+    summary = {
+        "path": path,
+        "rows": len(documents),
+        "sources": {source_name: count for source_name, count in counts.items()},
+        "bytes": os.path.getsize(path),
+        "elapsed_seconds": round(time.monotonic() - started, 2)
+    }
+    logger.info(f"Wrote corpus artifact {path}: {summary}")
+    return summary
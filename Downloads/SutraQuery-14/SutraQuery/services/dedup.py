@@ -0,0 +1,86 @@
+import logging
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Universal hashing modulo the Mersenne prime 2^31 - 1 keeps a * x + b inside uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_TOKEN = re.compile(r'\w+')
+
+
+class MinHasher:
+    """MinHash signatures over word shingles; formatting and case differences do not change them"""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Stable 31-bit hashes of the word n-grams of a text (single words for very short texts)"""
+        tokens = _TOKEN.findall(text.lower())
+        size = self.shingle_size if len(tokens) >= self.shingle_size else 1
+        grams = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+        return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64,
+                           count=len(grams)) % _PRIME
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Minimum of every permutation over the shingles; None for texts without words"""
+        shingles = self.shingles(text)
+        if not len(shingles):
+            return None
+        return ((shingles[:, None] * self.a + self.b) % _PRIME).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """LSH index over MinHash signatures that maps near-duplicate chunks from different sources to the
+    first copy seen. Candidates sharing a band are confirmed by their estimated Jaccard similarity."""
+
+    def __init__(self, threshold: float, num_perm: int = 128, rows: int = 4):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.rows = rows
+        self.bands = num_perm // rows
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = defaultdict(list)
+        self._signatures: Dict[str, Tuple[np.ndarray, str]] = {}
+
+    def check(self, doc_id: str, text: str, source: str) -> Optional[str]:
+        """Return the id of an indexed near-duplicate from another source, or index this chunk and return None"""
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return None
+        keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+        checked = set()
+        for key in keys:
+            for candidate in self._buckets.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                candidate_signature, candidate_source = self._signatures[candidate]
+                if candidate_source == source:
+                    continue
+                if float(np.mean(candidate_signature == signature)) >= self.threshold:
+                    return candidate
+
+        self._signatures[doc_id] = (signature, source)
+        for key in keys:
+            self._buckets[key].append(doc_id)
+        return None
+
+
+def source_reference(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Where a merged duplicate came from, kept on its canonical chunk"""
+    return {
+        "id": doc.get("id"),
+        "source": doc.get("source", ""),
+        "chapter": doc.get("chapter", ""),
+        "verse": doc.get("verse", ""),
+        "verse_id": (doc.get("metadata") or {}).get("verse_id", "")
+    }
@@ -1,138 +1,260 @@
 import pandas as pd
+import io
 import json
 import logging
-from typing import List, Dict, Any, Tuple
+import mmap
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Iterator, Iterable, Optional, Set
 import os
-import re
 from config import Config
 from utils.text_utils import TextChunker
+from utils.json_stream import iter_json_array, iter_json_array_items, json_array_offsets, peek_json_type
+from utils.text_scanners import RULER, scan_kanda, scan_gita
 
 logger = logging.getLogger(__name__)
 
+# Shard spec (index, count): a worker only emits the index-th of count contiguous slices of a file
+FULL_FILE = (0, 1)
+
+# A TXT file with a section ruler in its first block is read as Kanda text
+KANDA_SNIFF_BYTES = 64 * 1024
+
+_worker_processor = None
+
+
+class SourceParseError(Exception):
+    """A source file could not be parsed completely, so the chunks yielded for it are incomplete"""
+
+
+def _init_worker():
+    """Create one DocumentProcessor per pool worker"""
+    global _worker_processor
+    _worker_processor = DocumentProcessor()
+
+
+def _parse_shard(task: Tuple[str, str, Tuple[int, int], Any]) -> List[Dict[str, Any]]:
+    """Parse and chunk one shard of a source file inside a pool worker. The last field is the shard's part
+    of the file as planned by the parent process (see DocumentProcessor._prepare_shards), or None."""
+    source_name, filepath, shard, part = task
+    return list(_worker_processor.iter_file(filepath, source_name, shard, part))
+
+
+def _shard_bounds(length: int, shard: Tuple[int, int]) -> Tuple[int, int]:
+    """Return the [start, end) slice of `length` items covered by a shard"""
+    index, count = shard
+    return length * index // count, length * (index + 1) // count
+
+
 class DocumentProcessor:
+    # Bump whenever parsing or chunking changes the records produced from unchanged files, or when files
+    # may have been recorded as indexed without being parsed completely (v3: parse errors were swallowed)
+    PARSER_VERSION = 3
+    
     def __init__(self):
         self.config = Config()
         self.chunker = TextChunker(
             chunk_size=self.config.CHUNK_SIZE,
-            overlap=self.config.CHUNK_OVERLAP
+            overlap=self.config.CHUNK_OVERLAP,
+            unit=self.config.CHUNK_UNIT
         )
     
+    def parse_fingerprint(self) -> str:
+        """Parser and chunker settings that determine the records produced from a file"""
+        return f"v{self.PARSER_VERSION}:{self.config.CHUNK_SIZE}:{self.config.CHUNK_OVERLAP}:{self.config.CHUNK_UNIT}"
+    
     def process_csv_file(self, filepath: str, source_name: str) -> List[Dict[str, Any]]:
         """Process CSV file and return list of document chunks"""
+        return list(self.iter_csv_file(filepath, source_name))
+    
+    def iter_csv_file(self, filepath: str, source_name: str, shard: Tuple[int, int] = FULL_FILE,
+                      rows: Optional[pd.DataFrame] = None) -> Iterator[Dict[str, Any]]:
+        """Process CSV file (or one shard of its rows) and yield document chunks one at a time.
+        `rows` are the shard's rows when the caller has already read the file (see csv_row_shards)."""
         try:
-            df = pd.read_csv(filepath)
+            if rows is not None:
+                df = rows
+            else:
+                df = pd.read_csv(filepath)
+                if shard != FULL_FILE:
+                    start, end = _shard_bounds(len(df), shard)
+                    df = df.iloc[start:end]
             logger.info(f"Processing CSV file: {filepath} with {len(df)} rows")
             
-            documents = []
+            # Build every field and the embedding text column-wise instead of row by row
+            chapters = self._csv_key_column(df, 'chapter')
+            verses = self._csv_key_column(df, 'verse')
+            sanskrits = self._csv_text_column(df, 'sanskrit')
+            translations = self._csv_text_column(df, 'translation')
+            explanations = self._csv_text_column(df, 'explanation')
+            questions = self._csv_text_column(df, 'question')
             
-            for _, row in df.iterrows():
-                # Extract fields based on CSV structure
-                chapter = str(row.get('chapter', ''))
-                verse = str(row.get('verse', ''))
-                sanskrit_val = row.get('sanskrit')
-                translation_val = row.get('translation')
-                explanation_val = row.get('explanation') 
-                question_val = row.get('question')
-                
-                sanskrit = str(sanskrit_val) if sanskrit_val is not None and pd.notna(sanskrit_val) else ''
-                translation = str(translation_val) if translation_val is not None and pd.notna(translation_val) else ''
-                explanation = str(explanation_val) if explanation_val is not None and pd.notna(explanation_val) else ''
-                question = str(question_val) if question_val is not None and pd.notna(question_val) else ''
-                
-                # Create text content for embedding
-                text_parts = []
-                if sanskrit:
-                    text_parts.append(f"Sanskrit: {sanskrit}")
-                if translation:
-                    text_parts.append(f"Translation: {translation}")
-                if explanation:
-                    text_parts.append(f"Explanation: {explanation}")
-                if question:
-                    text_parts.append(f"Related Question: {question}")
-                
-                text_content = "\n\n".join(text_parts)
+            # Create text content for embedding: labelled non-empty fields joined by blank lines
+            text_content = pd.Series('', index=df.index, dtype=object)
+            for label, column in (("Sanskrit: ", sanskrits), ("Translation: ", translations),
+                                  ("Explanation: ", explanations), ("Related Question: ", questions)):
+                text_content = text_content + (label + column + "\n\n").where(column != '', '')
+            text_content = text_content.str[:-2]
+            has_text = text_content.str.strip() != ''
+            
+            count = 0
+            
+            # Chunk every row in one batch (a single tokenizer pass over the file in token mode)
+            row_chunks = self.chunker.chunk_many(text_content[has_text].tolist())
+            
+            for chapter, verse, sanskrit, translation, explanation, question, chunks in zip(
+                chapters[has_text].tolist(), verses[has_text].tolist(), sanskrits[has_text].tolist(),
+                translations[has_text].tolist(), explanations[has_text].tolist(),
+                questions[has_text].tolist(), row_chunks
+            ):
+                verse_id = f"{chapter}.{verse}"
+                has_question = bool(question)
                 
-                if text_content.strip():
-                    # Create chunks if text is too long
-                    chunks = self.chunker.chunk_text(text_content)
-                    
-                    for i, chunk in enumerate(chunks):
-                        doc = {
-                            "text": chunk,
-                            "source": source_name,
-                            "chapter": chapter,
-                            "verse": verse,
-                            "sanskrit": sanskrit,
-                            "translation": translation,
-                            "explanation": explanation,
-                            "metadata": {
-                                "verse_id": f"{chapter}.{verse}",
-                                "chunk_index": i,
-                                "total_chunks": len(chunks),
-                                "has_question": bool(question),
-                                "question": question
-                            }
+                for i, chunk in enumerate(chunks):
+                    doc = {
+                        "text": chunk,
+                        "source": source_name,
+                        "chapter": chapter,
+                        "verse": verse,
+                        "sanskrit": sanskrit,
+                        "translation": translation,
+                        "explanation": explanation,
+                        "metadata": {
+                            "verse_id": verse_id,
+                            "chunk_index": i,
+                            "total_chunks": len(chunks),
+                            "has_question": has_question,
+                            "question": question
                         }
-                        documents.append(doc)
+                    }
+                    count += 1
+                    yield doc
             
-            logger.info(f"Processed {len(documents)} document chunks from {filepath}")
-            return documents
+            logger.info(f"Processed {count} document chunks from {filepath}")
             
         except Exception as e:
-            logger.error(f"Error processing CSV file {filepath}: {e}")
-            return []
+            raise SourceParseError(f"Error processing CSV file {filepath}: {e}") from e
+    
+    @staticmethod
+    def csv_row_shards(filepath: str, shard_count: int) -> List[pd.DataFrame]:
+        """The rows of each of shard_count contiguous shards of a CSV file, read in one parse. Column dtypes
+        are inferred over the whole file, so the shards produce exactly the records of an unsharded read."""
+        df = pd.read_csv(filepath)
+        return [df.iloc[slice(*_shard_bounds(len(df), (index, shard_count)))] for index in range(shard_count)]
+    
+    @staticmethod
+    def _csv_key_column(df: pd.DataFrame, name: str) -> pd.Series:
+        """Stringify a key column as str() would per cell (NaN becomes 'nan'); '' if the column is absent"""
+        if name not in df.columns:
+            return pd.Series('', index=df.index, dtype=object)
+        return df[name].astype(object).map(str)
+    
+    @staticmethod
+    def _csv_text_column(df: pd.DataFrame, name: str) -> pd.Series:
+        """Stringify a text column with missing values as ''; '' if the column is absent"""
+        if name not in df.columns:
+            return pd.Series('', index=df.index, dtype=object)
+        column = df[name].astype(object)
+        return column.where(column.notna(), '').map(str)
     
     def process_json_file(self, filepath: str, source_name: str) -> List[Dict[str, Any]]:
         """Process JSON file with various formats and return list of document chunks"""
+        return list(self.iter_json_file(filepath, source_name))
+    
+    def iter_json_file(self, filepath: str, source_name: str, shard: Tuple[int, int] = FULL_FILE,
+                       span: Optional[Tuple[int, int]] = None) -> Iterator[Dict[str, Any]]:
+        """Process JSON file with various formats and yield document chunks one at a time.
+        Top-level arrays are parsed incrementally, one entry at a time, and are the only format that
+        is sharded: a shard decodes only its `span` of entries (from json_array_spans, planned here if not
+        given). Other formats are loaded whole and emitted entirely by shard 0."""
         try:
+            count = 0
             with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+                is_array = peek_json_type(f) == '['
+                if not is_array:
+                    if shard[0] != 0:
+                        return
+                    data = json.load(f)
             
-            documents = []
-            
-            # Handle different JSON formats
-            if isinstance(data, list):
-                logger.info(f"Processing JSON array file: {filepath} with {len(data)} entries")
-                documents = self._process_json_array(data, source_name)
-            elif isinstance(data, dict):
-                if "text" in data:
-                    # Single text object format (Kanda files)
-                    logger.info(f"Processing single text JSON file: {filepath}")
-                    documents = self._process_single_text_json(data, source_name)
-                elif "allowed_entities" in data:
-                    # Character database format
-                    logger.info(f"Processing character database: {filepath}")
-                    documents = self._process_character_database(data, source_name)
-                else:
-                    logger.warning(f"Unknown JSON format in {filepath}")
+            if is_array:
+                logger.info(f"Processing JSON array file: {filepath}")
+                if shard != FULL_FILE and span is None:
+                    span = self.json_array_spans(filepath, shard[1])[shard[0]]
+                documents = self._iter_json_array(self._iter_json_entries(filepath, span), source_name)
             else:
-                logger.warning(f"Unexpected JSON structure in {filepath}")
+                documents = self._iter_json_object(data, filepath, source_name)
+            
+            for doc in documents:
+                count += 1
+                yield doc
             
-            logger.info(f"Processed {len(documents)} document chunks from {filepath}")
-            return documents
+            logger.info(f"Processed {count} document chunks from {filepath}")
             
         except Exception as e:
-            logger.error(f"Error processing JSON file {filepath}: {e}")
-            return []
+            raise SourceParseError(f"Error processing JSON file {filepath}: {e}") from e
+    
+    @staticmethod
+    def json_array_spans(filepath: str, shard_count: int) -> Optional[List[Tuple[int, int]]]:
+        """(byte offset of the first entry, entry count) of each of shard_count contiguous shards of a
+        top-level JSON array, from one streaming pass over the file; None if the file is not an array"""
+        with open(filepath, 'r', encoding='utf-8', newline='') as f:
+            if peek_json_type(f) != '[':
+                return None
+            offsets = json_array_offsets(f)
+        spans = []
+        for index in range(shard_count):
+            start, end = _shard_bounds(len(offsets), (index, shard_count))
+            spans.append((offsets[start] if start < end else 0, end - start))
+        return spans
+    
+    @staticmethod
+    def _iter_json_entries(filepath: str, span: Optional[Tuple[int, int]]) -> Iterator[Any]:
+        """Entries of a top-level JSON array, or only the span (byte offset, count) of them"""
+        if span is None:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                yield from iter_json_array(f)
+            return
+        offset, count = span
+        with open(filepath, 'rb') as raw:
+            raw.seek(offset)
+            yield from iter_json_array_items(io.TextIOWrapper(raw, encoding='utf-8', newline=''), count)
+    
+    def _iter_json_object(self, data: Any, filepath: str, source_name: str) -> Iterator[Dict[str, Any]]:
+        """Dispatch a fully loaded (non-array) JSON document to its format handler"""
+        if isinstance(data, dict):
+            if "text" in data:
+                # Single text object format (Kanda files)
+                logger.info(f"Processing single text JSON file: {filepath}")
+                return iter(self._process_single_text_json(data, source_name))
+            elif "allowed_entities" in data:
+                # Character database format
+                logger.info(f"Processing character database: {filepath}")
+                return iter(self._process_character_database(data, source_name))
+            else:
+                logger.warning(f"Unknown JSON format in {filepath}")
+        else:
+            logger.warning(f"Unexpected JSON structure in {filepath}")
+        return iter(())
     
     def _process_json_array(self, data: List[Dict], source_name: str) -> List[Dict[str, Any]]:
         """Process JSON array format (verses, detailed content)"""
-        documents = []
-        
+        return list(self._iter_json_array(data, source_name))
+    
+    def _iter_json_array(self, data: Iterable[Dict], source_name: str) -> Iterator[Dict[str, Any]]:
+        """Yield document chunks for each entry of a JSON array (verses, detailed content).
+        `data` may be a list or a stream of entries from iter_json_array."""
         for entry in data:
             # Handle verses-extracted format
             if "Kanda" in entry and "Sarga" in entry:
-                documents.extend(self._process_verses_extracted_entry(entry, source_name))
+                yield from self._process_verses_extracted_entry(entry, source_name)
             # Handle iyd_dataset format  
             elif "Book Name" in entry:
-                documents.extend(self._process_iyd_dataset_entry(entry, source_name))
+                yield from self._process_iyd_dataset_entry(entry, source_name)
             # Handle original ramayana verses format
             elif "book_name" in entry:
-                documents.extend(self._process_original_verses_entry(entry, source_name))
+                yield from self._process_original_verses_entry(entry, source_name)
             else:
                 logger.warning(f"Unknown array entry format in {source_name}")
-        
-        return documents
     
     def _process_verses_extracted_entry(self, entry: Dict, source_name: str) -> List[Dict[str, Any]]:
         """Process verses-extracted format entry"""
@@ -281,54 +403,32 @@ class DocumentProcessor:
     def _process_single_text_json(self, data: Dict, source_name: str) -> List[Dict[str, Any]]:
         """Process single text object format (Kanda files)"""
         text_content = data.get('text', '')
-        documents = []
-        
-        if text_content:
-            # Parse the structured text content
-            sections = text_content.split('----------------------------------------')
+        if not text_content:
+            return []
+        return list(self._iter_kanda_documents(text_content.encode('utf-8', 'surrogatepass'), source_name,
+                                               universal_newlines=False))
+    
+    def _iter_kanda_documents(self, buffer, source_name: str, universal_newlines: bool = True) -> Iterator[Dict[str, Any]]:
+        """Yield document chunks for every section of Kanda text in a bytes buffer or mmap"""
+        for chapter, verse, content in scan_kanda(buffer, universal_newlines):
+            full_text = f"Chapter: {chapter}\nVerse: {verse}\nContent: {content}"
+            chunks = self.chunker.chunk_text(full_text)
             
-            for section in sections:
-                section = section.strip()
-                if not section:
-                    continue
-                
-                # Extract chapter and verse information
-                lines = section.split('\n')
-                chapter = ""
-                verse = ""
-                content = ""
-                
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith('Chapter:'):
-                        chapter = line.replace('Chapter:', '').strip()
-                    elif line.startswith('Verse:'):
-                        verse = line.replace('Verse:', '').strip()
-                    elif line.startswith('Content:'):
-                        content = line.replace('Content:', '').strip()
-                
-                if content:
-                    full_text = f"Chapter: {chapter}\nVerse: {verse}\nContent: {content}"
-                    chunks = self.chunker.chunk_text(full_text)
-                    
-                    for i, chunk in enumerate(chunks):
-                        doc = {
-                            "text": chunk,
-                            "source": source_name,
-                            "chapter": chapter,
-                            "verse": verse,
-                            "sanskrit": "",
-                            "translation": content,
-                            "explanation": "",
-                            "metadata": {
-                                "verse_id": f"{chapter}-{verse}",
-                                "chunk_index": i,
-                                "total_chunks": len(chunks)
-                            }
-                        }
-                        documents.append(doc)
-        
-        return documents
+            for i, chunk in enumerate(chunks):
+                yield {
+                    "text": chunk,
+                    "source": source_name,
+                    "chapter": chapter,
+                    "verse": verse,
+                    "sanskrit": "",
+                    "translation": content,
+                    "explanation": "",
+                    "metadata": {
+                        "verse_id": f"{chapter}-{verse}",
+                        "chunk_index": i,
+                        "total_chunks": len(chunks)
+                    }
+                }
     
     def _process_character_database(self, data: Dict, source_name: str) -> List[Dict[str, Any]]:
         """Process character database format"""
@@ -385,127 +485,194 @@ class DocumentProcessor:
     
     def process_txt_file(self, filepath: str, source_name: str) -> List[Dict[str, Any]]:
         """Process TXT file and return list of document chunks"""
+        return list(self.iter_txt_file(filepath, source_name))
+    
+    def iter_txt_file(self, filepath: str, source_name: str, shard: Tuple[int, int] = FULL_FILE) -> Iterator[Dict[str, Any]]:
+        """Process TXT file and yield document chunks one at a time. TXT files are not split; shard 0 emits everything"""
+        if shard[0] != 0:
+            return
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
             logger.info(f"Processing TXT file: {filepath}")
+            count = 0
             
-            # Parse the text file structure (Gita edition format)
-            documents = []
-            current_chapter = ""
-            current_verse = ""
-            current_text = ""
-            current_sanskrit = ""
+            with open(filepath, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            try:
+                if buffer.find(RULER, 0, KANDA_SNIFF_BYTES) != -1:
+                    # Ruler-delimited Kanda format, scanned in place
+                    documents = self._iter_kanda_documents(buffer, source_name)
+                    try:
+                        for doc in documents:
+                            count += 1
+                            yield doc
+                    finally:
+                        # Release the scanner's view of the map before closing it
+                        documents.close()
+                    logger.info(f"Processed {count} document chunks from {filepath}")
+                    return
+            finally:
+                if size:
+                    buffer.close()
             
-            lines = content.split('\n')
-            i = 0
-            
-            while i < len(lines):
-                line = lines[i].strip()
-                
-                # Check for chapter header
-                if line.startswith('Chapter-') or line.startswith('CHAPTER'):
-                    current_chapter = self._extract_chapter_number(line)
-                    i += 1
-                    continue
-                
-                # Check for text number (verse)
-                if line.startswith('TEXT '):
-                    current_verse = self._extract_verse_number(line)
-                    i += 1
-                    
-                    # Collect Sanskrit text
-                    sanskrit_lines = []
-                    while i < len(lines) and not lines[i].strip().startswith('TRANSLATION'):
-                        if lines[i].strip() and not lines[i].strip().startswith('TEXT'):
-                            sanskrit_lines.append(lines[i].strip())
-                        i += 1
+            # Gita edition format, streamed line by line
+            with open(filepath, 'r', encoding='utf-8') as f:
+                for chapter, verse, sanskrit, text in scan_gita(f):
+                    full_text = f"Chapter {chapter}, Verse {verse}\n\n"
+                    if sanskrit:
+                        full_text += f"Sanskrit: {sanskrit}\n\n"
+                    full_text += f"Translation and Commentary: {text}"
                     
-                    current_sanskrit = ' '.join(sanskrit_lines)
+                    chunks = self.chunker.chunk_text(full_text)
                     
-                    # Skip to translation
-                    if i < len(lines) and lines[i].strip().startswith('TRANSLATION'):
-                        i += 1
-                        
-                        # Collect translation and purport
-                        content_lines = []
-                        while i < len(lines) and not lines[i].strip().startswith('TEXT '):
-                            if lines[i].strip():
-                                content_lines.append(lines[i].strip())
-                            i += 1
-                        
-                        current_text = ' '.join(content_lines)
-                        
-                        # Create document
-                        if current_text and current_chapter and current_verse:
-                            full_text = f"Chapter {current_chapter}, Verse {current_verse}\n\n"
-                            if current_sanskrit:
-                                full_text += f"Sanskrit: {current_sanskrit}\n\n"
-                            full_text += f"Translation and Commentary: {current_text}"
-                            
-                            chunks = self.chunker.chunk_text(full_text)
-                            
-                            for j, chunk in enumerate(chunks):
-                                doc = {
-                                    "text": chunk,
-                                    "source": source_name,
-                                    "chapter": current_chapter,
-                                    "verse": current_verse,
-                                    "sanskrit": current_sanskrit,
-                                    "translation": current_text,
-                                    "explanation": "",
-                                    "metadata": {
-                                        "verse_id": f"{current_chapter}.{current_verse}",
-                                        "chunk_index": j,
-                                        "total_chunks": len(chunks)
-                                    }
-                                }
-                                documents.append(doc)
-                        continue
-                
-                i += 1
+                    for j, chunk in enumerate(chunks):
+                        count += 1
+                        yield {
+                            "text": chunk,
+                            "source": source_name,
+                            "chapter": chapter,
+                            "verse": verse,
+                            "sanskrit": sanskrit,
+                            "translation": text,
+                            "explanation": "",
+                            "metadata": {
+                                "verse_id": f"{chapter}.{verse}",
+                                "chunk_index": j,
+                                "total_chunks": len(chunks)
+                            }
+                        }
             
-            logger.info(f"Processed {len(documents)} document chunks from {filepath}")
-            return documents
+            logger.info(f"Processed {count} document chunks from {filepath}")
             
         except Exception as e:
-            logger.error(f"Error processing TXT file {filepath}: {e}")
-            return []
-    
-    def _extract_chapter_number(self, text: str) -> str:
-        """Extract chapter number from text"""
-        match = re.search(r'(\d+)', text)
-        return match.group(1) if match else ""
+            raise SourceParseError(f"Error processing TXT file {filepath}: {e}") from e
     
-    def _extract_verse_number(self, text: str) -> str:
-        """Extract verse number from text"""
-        match = re.search(r'TEXT\s+(\d+)', text)
-        return match.group(1) if match else ""
-    
-    def process_all_files(self) -> List[Dict[str, Any]]:
-        """Process all data files"""
-        all_documents = []
+    def iter_source_files(self, sources: Optional[Set[str]] = None) -> Iterator[Tuple[str, str]]:
+        """Yield (source_name, filepath) for every configured data file that exists, optionally limited to `sources`"""
         data_files = self.config.get_data_files()
         
         for source_name, filename in data_files.items():
+            if sources is not None and source_name not in sources:
+                continue
             filepath = os.path.join(self.config.DATA_DIR, filename)
             
             if not os.path.exists(filepath):
                 logger.warning(f"File not found: {filepath}")
                 continue
             
-            if filename.endswith('.csv'):
-                docs = self.process_csv_file(filepath, source_name)
-            elif filename.endswith('.txt'):
-                docs = self.process_txt_file(filepath, source_name)
-            elif filename.endswith('.json'):
-                docs = self.process_json_file(filepath, source_name)
-            else:
-                logger.warning(f"Unsupported file format: {filename}")
+            yield source_name, filepath
+    
+    def iter_file(self, filepath: str, source_name: str, shard: Tuple[int, int] = FULL_FILE,
+                  part: Any = None) -> Iterator[Dict[str, Any]]:
+        """Yield document chunks from a single data file (or shard of it), dispatching on its format.
+        `part` is the shard's part of the file as planned by _prepare_shards, if any."""
+        if filepath.endswith('.csv'):
+            yield from self.iter_csv_file(filepath, source_name, shard, part)
+        elif filepath.endswith('.txt'):
+            yield from self.iter_txt_file(filepath, source_name, shard)
+        elif filepath.endswith('.json'):
+            yield from self.iter_json_file(filepath, source_name, shard, part)
+        else:
+            logger.warning(f"Unsupported file format: {filepath}")
+    
+    def iter_all_files(self, workers: Optional[int] = None, sources: Optional[Set[str]] = None,
+                       failed: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield document chunks from all data files (or only `sources`) without materialising the corpus.
+        With more than one worker, files are parsed in a process pool and yielded in source order.
+        A file that fails to parse is logged and skipped after the chunks it yielded so far; its source
+        name is added to `failed` before any chunk of a later file is yielded."""
+        workers = self._resolve_workers(workers)
+        if workers <= 1:
+            for source_name, filepath in self.iter_source_files(sources):
+                try:
+                    yield from self.iter_file(filepath, source_name)
+                except SourceParseError as e:
+                    self._record_parse_failure(source_name, e, failed)
+            return
+        
+        yield from self._iter_all_files_parallel(workers, sources, failed)
+    
+    @staticmethod
+    def _record_parse_failure(source_name: str, error: SourceParseError, failed: Optional[Set[str]]):
+        logger.error(str(error))
+        if failed is not None:
+            failed.add(source_name)
+    
+    def _resolve_workers(self, workers: Optional[int]) -> int:
+        """Resolve a worker count; None uses INGEST_WORKERS and 0 means one per CPU"""
+        if workers is None:
+            workers = self.config.INGEST_WORKERS
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return workers
+    
+    def _plan_shards(self, workers: int, sources: Optional[Set[str]] = None) -> List[Tuple[str, str, Tuple[int, int]]]:
+        """Split source files into parse tasks; large CSV/JSON files are cut into row shards"""
+        tasks = []
+        for source_name, filepath in self.iter_source_files(sources):
+            shard_count = 1
+            if filepath.endswith(('.csv', '.json')):
+                size = os.path.getsize(filepath)
+                shard_count = max(1, min(workers, size // self.config.INGEST_SHARD_BYTES))
+            for index in range(shard_count):
+                tasks.append((source_name, filepath, (index, shard_count)))
+        return tasks
+    
+    def _prepare_shards(self, tasks: List[Tuple[str, str, Tuple[int, int]]]) -> Iterator[Tuple[str, str, Tuple[int, int], Any]]:
+        """Attach to each task its shard's part of the file, planned in one pass over a sharded file when its
+        first shard comes up (the rows of each shard of a CSV file, the entry span of each shard of a JSON
+        array), so shards do not each parse the whole file. If planning fails, the shards get no part and
+        report the error themselves."""
+        planned, parts = None, None
+        for source_name, filepath, shard in tasks:
+            if shard == FULL_FILE:
+                yield source_name, filepath, shard, None
                 continue
+            if filepath != planned:
+                planned, parts = filepath, self._plan_shard_parts(filepath, shard[1])
+            yield source_name, filepath, shard, parts[shard[0]] if parts is not None else None
+    
+    def _plan_shard_parts(self, filepath: str, shard_count: int) -> Optional[List[Any]]:
+        try:
+            if filepath.endswith('.csv'):
+                return self.csv_row_shards(filepath, shard_count)
+            if filepath.endswith('.json'):
+                return self.json_array_spans(filepath, shard_count)
+        except Exception as e:
+            logger.warning(f"Could not plan the shards of {filepath}: {e}")
+        return None
+    
+    def _iter_all_files_parallel(self, workers: int, sources: Optional[Set[str]] = None,
+                                 failed: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Parse shards in a process pool, keeping a bounded window in flight and yielding in task order"""
+        tasks = self._plan_shards(workers, sources)
+        logger.info(f"Parsing {len(tasks)} shards with {workers} worker processes")
+        
+        max_in_flight = workers * 2
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            pending = deque()
+            task_iter = self._prepare_shards(tasks)
             
-            all_documents.extend(docs)
+            for task in task_iter:
+                pending.append((task[0], executor.submit(_parse_shard, task)))
+                if len(pending) >= max_in_flight:
+                    break
+            
+            while pending:
+                source_name, future = pending.popleft()
+                next_task = next(task_iter, None)
+                if next_task is not None:
+                    pending.append((next_task[0], executor.submit(_parse_shard, next_task)))
+                try:
+                    documents = future.result()
+                except SourceParseError as e:
+                    self._record_parse_failure(source_name, e, failed)
+                    continue
+                yield from documents
+    
+    def process_all_files(self, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Process all data files"""
+        all_documents = list(self.iter_all_files(workers))
         
         logger.info(f"Total processed documents: {len(all_documents)}")
         return all_documents
@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Bump when the key derivation or row layout changes; a cache with another version is recreated
+CACHE_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash BLOB NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+CREATE TABLE IF NOT EXISTS lookups (
+    model TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL
+);
+"""
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def text_key(text: str) -> bytes:
+    """Cache key of a text: SHA-256 of its NFC form with whitespace runs collapsed and the ends stripped"""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.sha256(normalized.encode('utf-8')).digest()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by (model, normalized-text hash), stored in SQLite as float32 blobs.
+
+    Lookup hit/miss counts are kept per model in the same database, so the hit rate covers every
+    process that used the cache. One connection is shared behind a lock; WAL mode lets other
+    processes read while this one writes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, CACHE_SCHEMA_VERSION):
+            logger.warning(f"Embedding cache {path} has schema version {version}, recreating it")
+            self._connection.executescript("DROP TABLE IF EXISTS embeddings; DROP TABLE IF EXISTS lookups;")
+        self._connection.executescript(_SCHEMA)
+        self._connection.execute(f"PRAGMA user_version={CACHE_SCHEMA_VERSION}")
+        self._connection.commit()
+
+    def get_many(self, model: str, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], int]:
+        """Cached embeddings for texts (None where missing) and the number of hits"""
+        keys = [text_key(text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = list(set(keys[i:i + _LOOKUP_CHUNK]))
+                rows = self._connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN "
+                    f"({','.join('?' * len(chunk))})", [model, *chunk]
+                ).fetchall()
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float32)
+
+            results = [found.get(key) for key in keys]
+            hits = sum(result is not None for result in results)
+            if found:
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, key) for key in found]
+                )
+            self._count_lookups(model, hits, len(keys) - hits)
+            self._connection.commit()
+        return results, hits
+
+    def put_many(self, model: str, texts: List[str], embeddings: np.ndarray):
+        """Store embeddings (rows of a float32 matrix) for texts, replacing existing entries"""
+        now = time.time()
+        rows = [
+            (model, text_key(text), embedding.shape[0], np.ascontiguousarray(embedding, dtype=np.float32).tobytes(), now, now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self._connection.commit()
+
+    def _count_lookups(self, model: str, hits: int, misses: int):
+        self._connection.execute(
+            "INSERT INTO lookups (model, hits, misses) VALUES (?, ?, ?) "
+            "ON CONFLICT(model) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+            (model, hits, misses)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Entries, size on disk and lookup hit rate, overall and per model"""
+        with self._lock:
+            entries = dict(self._connection.execute(
+                "SELECT model, COUNT(*) FROM embeddings GROUP BY model").fetchall())
+            lookups = {model: (hits, misses) for model, hits, misses in
+                       self._connection.execute("SELECT model, hits, misses FROM lookups").fetchall()}
+        models = {}
+        for model in sorted(set(entries) | set(lookups)):
+            hits, misses = lookups.get(model, (0, 0))
+            models[model] = {
+                "entries": entries.get(model, 0),
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0
+            }
+        hits = sum(model["hits"] for model in models.values())
+        misses = sum(model["misses"] for model in models.values())
+        return {
+            "path": self.path,
+            "entries": sum(entries.values()),
+            "bytes": sum(os.path.getsize(f"{self.path}{suffix}") for suffix in ("", "-wal")
+                         if os.path.exists(f"{self.path}{suffix}")),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "models": models
+        }
+
+    def evict(self, max_entries: Optional[int] = None, older_than_days: Optional[float] = None,
+              model: Optional[str] = None) -> int:
+        """Delete entries of other models than `model` (if given), entries unused for older_than_days,
+        and the least recently used entries beyond max_entries. Returns the number deleted."""
+        deleted = 0
+        with self._lock:
+            if model is not None:
+                deleted += self._connection.execute("DELETE FROM embeddings WHERE model != ?", (model,)).rowcount
+            if older_than_days is not None:
+                cutoff = time.time() - older_than_days * 86400
+                deleted += self._connection.execute("DELETE FROM embeddings WHERE last_used < ?", (cutoff,)).rowcount
+            if max_entries is not None:
+                deleted += self._connection.execute(
+                    "DELETE FROM embeddings WHERE (model, text_hash) IN (SELECT model, text_hash FROM embeddings "
+                    "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (max_entries,)
+                ).rowcount
+            self._connection.commit()
+        logger.info(f"Evicted {deleted} entries from embedding cache {self.path}")
+        return deleted
+
+    def compact(self):
+        """Reclaim the space of deleted entries and fold the WAL into the database file"""
+        with self._lock:
+            self._connection.execute("VACUUM")
+            self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.info(f"Compacted embedding cache {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and maintain the on-disk embedding cache")
+    parser.add_argument('--path', default=Config.EMBEDDING_CACHE_FILE, help='Cache database path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Entries, size and hit rate')
+    evict = subparsers.add_parser('evict', help='Delete old, surplus or other-model entries')
+    evict.add_argument('--max-entries', type=int, default=None, help='Keep at most this many (least recently used go first)')
+    evict.add_argument('--older-than', type=float, default=None, help='Delete entries unused for this many days')
+    evict.add_argument('--keep-model', default=None, help='Delete entries of every other model')
+    evict.add_argument('--compact', action='store_true', help='Compact the database afterwards')
+    subparsers.add_parser('compact', help='Reclaim space left by deleted entries')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not os.path.exists(args.path):
+        logger.error(f"No embedding cache at {args.path}")
+        sys.exit(1)
+
+    cache = EmbeddingCache(args.path)
+    try:
+        if args.command == 'evict':
+            cache.evict(max_entries=args.max_entries, older_than_days=args.older_than, model=args.keep_model)
+            if args.compact:
+                cache.compact()
+        elif args.command == 'compact':
+            cache.compact()
+        stats = cache.stats()
+        print(f"{stats['path']}: {stats['entries']} entries, {stats['bytes'] / (1024 * 1024):.1f} MB, "
+              f"hit rate {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['misses']} misses)")
+        for model, model_stats in stats['models'].items():
+            print(f"  {model}: {model_stats['entries']} entries, hit rate {model_stats['hit_rate']:.1%}")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
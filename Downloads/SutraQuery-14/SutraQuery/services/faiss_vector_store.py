@@ -1,12 +1,21 @@
+import asyncio
 import faiss
 import numpy as np
+import hashlib
 import json
 import os
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
+from utils.file_utils import write_json_atomic
 
 logger = logging.getLogger(__name__)
 
+# metadata.json layout: {"format": 2, "verses": {key: fields}, "chunks": [...]}; format 1 was a bare chunk list
+METADATA_FORMAT = 2
+
+# Verse-level fields, stored once per verse and referenced from its chunks
+VERSE_FIELDS = ("sanskrit", "translation", "explanation")
+
 class FaissVectorStore:
     def __init__(self, embedding_dim=1024, index_file="vector_index.faiss", metadata_file="metadata.json"):
         self.embedding_dim = embedding_dim
@@ -14,7 +23,9 @@ class FaissVectorStore:
         self.metadata_file = metadata_file
         self.index = faiss.IndexFlatIP(embedding_dim)  # Inner product for cosine similarity
         self.metadata = []
+        self.verses: Dict[str, Dict[str, str]] = {}
         self.is_available = True
+        self.store_name = f"faiss:{os.path.abspath(index_file)}"
         
         # Load existing index if available
         self._load_index()
@@ -26,25 +37,79 @@ class FaissVectorStore:
             if os.path.exists(self.index_file) and os.path.exists(self.metadata_file):
                 self.index = faiss.read_index(self.index_file)
                 with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    self.metadata = json.load(f)
-                logger.info(f"Loaded existing index with {len(self.metadata)} documents")
+                    data = json.load(f)
+                if isinstance(data, list):
+                    # Format 1 copied the verse fields into every chunk; normalize on load
+                    self.metadata, self.verses = [], {}
+                    for entry in data:
+                        self.metadata.append(self._normalize_entry(entry))
+                    logger.info("Converted metadata to the verse table format; it is rewritten on the next save")
+                elif data.get("format") == METADATA_FORMAT:
+                    self.metadata = data["chunks"]
+                    self.verses = data["verses"]
+                else:
+                    raise ValueError(f"unsupported metadata format {data.get('format')}")
+                if self.index.ntotal != len(self.metadata):
+                    raise ValueError(f"index has {self.index.ntotal} vectors but metadata has {len(self.metadata)} entries")
+                logger.info(f"Loaded existing index with {len(self.metadata)} documents and {len(self.verses)} verses")
         except Exception as e:
             logger.warning(f"Could not load existing index: {e}")
             self.index = faiss.IndexFlatIP(self.embedding_dim)
             self.metadata = []
+            self.verses = {}
     
     def _save_index(self):
-        """Save FAISS index and metadata"""
+        """Save FAISS index and metadata, logging a failure instead of raising it"""
         try:
-            faiss.write_index(self.index, self.index_file)
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, ensure_ascii=False, indent=2)
-            logger.info("Index and metadata saved successfully")
+            self._write_index()
         except Exception as e:
             logger.error(f"Error saving index: {e}")
     
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to the vector store"""
+    def _write_index(self):
+        """Save FAISS index and metadata. Each file is written to a temp path and renamed into place,
+        so a crash leaves either the old or the new version; a mismatched pair is rejected on load."""
+        # Drop verses whose chunks have all been deleted
+        referenced = {entry["verse_ref"] for entry in self.metadata if "verse_ref" in entry}
+        self.verses = {key: fields for key, fields in self.verses.items() if key in referenced}
+        
+        tmp_index_file = f"{self.index_file}.tmp"
+        faiss.write_index(self.index, tmp_index_file)
+        write_json_atomic(self.metadata_file, {
+            "format": METADATA_FORMAT,
+            "verses": self.verses,
+            "chunks": self.metadata
+        }, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_index_file, self.index_file)
+        logger.info("Index and metadata saved successfully")
+    
+    def _normalize_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Move a chunk's verse fields into the verse table and reference them by key.
+        Chunks without a verse_id (e.g. character entries) keep their fields inline."""
+        fields = {field: entry.get(field, "") for field in VERSE_FIELDS}
+        chunk = {key: value for key, value in entry.items() if key not in VERSE_FIELDS}
+        verse_id = (entry.get("metadata") or {}).get("verse_id")
+        if not verse_id or not any(fields.values()):
+            chunk.update(fields)
+            return chunk
+        
+        key = f"{entry.get('source', '')}:{verse_id}"
+        if self.verses.get(key, fields) != fields:
+            # Same verse id with different text; keep both under distinct keys
+            digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+            key = f"{key}#{digest}"
+        self.verses.setdefault(key, fields)
+        chunk["verse_ref"] = key
+        return chunk
+    
+    def _verse_fields(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """Sanskrit, translation and explanation of a chunk, from the verse table or inline"""
+        fields = self.verses.get(entry.get("verse_ref"))
+        if fields is None:
+            fields = entry
+        return {field: fields.get(field, "") for field in VERSE_FIELDS}
+    
+    def add_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
+        """Add documents to the vector store. Pass persist=False when adding in batches and call flush() at the end"""
         try:
             embeddings = []
             metadata_batch = []
@@ -59,8 +124,9 @@ class FaissVectorStore:
                 embedding = embedding / np.linalg.norm(embedding)
                 embeddings.append(embedding)
                 
-                # Store metadata
-                metadata_entry = {
+                # Store metadata; verse fields go to the verse table once per verse
+                metadata_entry = self._normalize_entry({
+                    "id": doc.get("id"),
                     "text": doc.get("text", ""),
                     "source": doc.get("source", ""),
                     "chapter": doc.get("chapter", ""),
@@ -69,14 +135,15 @@ class FaissVectorStore:
                     "translation": doc.get("translation", ""),
                     "explanation": doc.get("explanation", ""),
                     "metadata": doc.get("metadata", {})
-                }
+                })
                 metadata_batch.append(metadata_entry)
             
             if embeddings:
                 embeddings_array = np.array(embeddings, dtype=np.float32)
                 self.index.add(embeddings_array)
                 self.metadata.extend(metadata_batch)
-                self._save_index()
+                if persist:
+                    self._save_index()
                 
                 logger.info(f"Added {len(embeddings)} documents to vector store")
             
@@ -104,17 +171,18 @@ class FaissVectorStore:
                     metadata = self.metadata[idx]
                     
                     # Apply source filter if specified
-                    if source_filter and metadata.get("source", "") != source_filter:
+                    if source_filter and not self._matches_source(metadata, source_filter):
                         continue
                     
+                    verse_fields = self._verse_fields(metadata)
                     result = {
                         "text": metadata.get("text", ""),
                         "source": metadata.get("source", ""),
                         "chapter": metadata.get("chapter", ""),
                         "verse": metadata.get("verse", ""),
-                        "sanskrit": metadata.get("sanskrit", ""),
-                        "translation": metadata.get("translation", ""),
-                        "explanation": metadata.get("explanation", ""),
+                        "sanskrit": verse_fields["sanskrit"],
+                        "translation": verse_fields["translation"],
+                        "explanation": verse_fields["explanation"],
                         "score": float(score),
                         "metadata": metadata.get("metadata", {})
                     }
@@ -130,12 +198,70 @@ class FaissVectorStore:
             logger.error(f"Error searching vector store: {e}")
             return []
     
+    @staticmethod
+    def _matches_source(entry: Dict[str, Any], source: str) -> bool:
+        """Whether a chunk comes from source, itself or through a near-duplicate merged into it"""
+        if entry.get("source", "") == source:
+            return True
+        return any(ref.get("source") == source for ref in (entry.get("metadata") or {}).get("duplicates", ()))
+    
+    async def asearch(self, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """search for the async query path; the in-process index search runs in a worker thread"""
+        return await asyncio.to_thread(self.search, query_embedding, limit, source_filter)
+    
+    def get_document_ids(self) -> Set[str]:
+        """Return the chunk ids of all stored documents"""
+        return {entry["id"] for entry in self.metadata if entry.get("id")}
+    
+    def delete_documents(self, ids: List[str], persist: bool = True):
+        """Delete documents by chunk id"""
+        try:
+            id_set = set(ids)
+            positions = [i for i, entry in enumerate(self.metadata) if entry.get("id") in id_set]
+            if not positions:
+                return
+            
+            # IndexFlat.remove_ids compacts the remaining vectors, keeping them aligned with self.metadata
+            self.index.remove_ids(np.array(positions, dtype=np.int64))
+            removed = set(positions)
+            self.metadata = [entry for i, entry in enumerate(self.metadata) if i not in removed]
+            if persist:
+                self._save_index()
+            
+            logger.info(f"Deleted {len(positions)} documents from vector store")
+            
+        except Exception as e:
+            logger.error(f"Error deleting documents: {e}")
+            raise
+    
+    def set_duplicate_references(self, references: Dict[str, List[Dict[str, Any]]], persist: bool = True):
+        """Record on each chunk the sources of the near-duplicates merged into it (an empty list clears them)"""
+        positions = {entry.get("id"): i for i, entry in enumerate(self.metadata)}
+        for doc_id, refs in references.items():
+            position = positions.get(doc_id)
+            if position is None:
+                continue
+            metadata = dict(self.metadata[position].get("metadata") or {})
+            if refs:
+                metadata["duplicates"] = refs
+            else:
+                metadata.pop("duplicates", None)
+            self.metadata[position]["metadata"] = metadata
+        if persist:
+            self._save_index()
+    
+    def flush(self):
+        """Persist the index and metadata to disk. Raises if they could not be written, so a caller that
+        records progress after flushing (the ingest pipeline) never records batches that are not on disk."""
+        self._write_index()
+    
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the collection"""
         return {
             "vectors_count": self.index.ntotal,
             "indexed_vectors_count": self.index.ntotal,
             "points_count": len(self.metadata),
+            "verses_count": len(self.verses),
             "status": "available"
         }
     
@@ -144,6 +270,7 @@ class FaissVectorStore:
         try:
             self.index = faiss.IndexFlatIP(self.embedding_dim)
             self.metadata = []
+            self.verses = {}
             self._save_index()
             logger.info("Collection cleared successfully")
         except Exception as e:
@@ -0,0 +1,157 @@
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Tuple
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class PooledSession:
+    """Keep-alive requests.Session for one provider with a bounded connection pool and default
+    (connect, read) timeouts. Connections are reused across requests and threads; reuse is
+    reported from the connection pools' own counters."""
+
+    def __init__(self, name: str, pool_size: int, connect_timeout: float, read_timeout: float):
+        self.name = name
+        self.pool_size = pool_size
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        # Retries are handled by the callers, which know which failures are worth retrying
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self._lock = threading.Lock()
+        self.timeouts = 0
+        self.errors = 0
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST through the pool; the timeout defaults to the session's (connect, read) timeouts"""
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            return self.session.post(url, **kwargs)
+        except requests.Timeout:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        except requests.RequestException:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests sent, connections opened and how many requests reused an open connection"""
+        requests_sent = 0
+        connections = 0
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+        with self._lock:
+            return {
+                "requests": requests_sent,
+                "connections_opened": connections,
+                "connection_reuse_rate": round(1 - connections / requests_sent, 4) if requests_sent else 0.0,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "pool_size": self.pool_size,
+                "connect_timeout": self.timeout[0],
+                "read_timeout": self.timeout[1]
+            }
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncPooledClient:
+    """httpx.AsyncClient for one provider on the background event loop, with a bounded keep-alive pool
+    and default timeouts. New connections are counted through httpx's trace extension."""
+
+    def __init__(self, name: str, max_connections: int, connect_timeout: float, read_timeout: float):
+        self.name = name
+        self.max_connections = max_connections
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=self.timeout
+        )
+        self.requests = 0
+        self.connections = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        if event_name == "connection.connect_tcp.complete":
+            self.connections += 1
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """POST through the pool. Counters are only touched on the event loop, so they need no lock."""
+        self.requests += 1
+        try:
+            return await self.client.post(url, extensions={"trace": self._trace}, **kwargs)
+        except httpx.TimeoutException:
+            self.timeouts += 1
+            raise
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+
+    @asynccontextmanager
+    async def stream_post(self, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """POST whose response body is read incrementally; leaving the block closes the response,
+        which aborts the transfer if it has not finished"""
+        self.requests += 1
+        try:
+            async with self.client.stream("POST", url, extensions={"trace": self._trace}, **kwargs) as response:
+                yield response
+        except httpx.TimeoutException:
+            self.timeouts += 1
+            raise
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections,
+            "connection_reuse_rate": round(1 - self.connections / self.requests, 4) if self.requests else 0.0,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "max_connections": self.max_connections,
+            "connect_timeout": self.timeout.connect,
+            "read_timeout": self.timeout.read
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_shared_sessions: Dict[str, PooledSession] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_session(provider: str, pool_size: int, connect_timeout: float, read_timeout: float) -> PooledSession:
+    """One pooled session per provider, shared by every client in the process"""
+    with _shared_lock:
+        session = _shared_sessions.get(provider)
+        if session is None:
+            session = _shared_sessions[provider] = PooledSession(provider, pool_size, connect_timeout, read_timeout)
+        return session
+
+
+_shared_async_clients: Dict[str, AsyncPooledClient] = {}
+
+
+def shared_async_client(provider: str, max_connections: int, connect_timeout: float,
+                        read_timeout: float) -> AsyncPooledClient:
+    """One async client per provider, shared by every client in the process (use only on the background loop)"""
+    with _shared_lock:
+        client = _shared_async_clients.get(provider)
+        if client is None:
+            client = _shared_async_clients[provider] = AsyncPooledClient(provider, max_connections,
+                                                                         connect_timeout, read_timeout)
+        return client
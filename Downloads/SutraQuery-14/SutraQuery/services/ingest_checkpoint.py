@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+import time
+from typing import List, Dict, Any, Optional
+from utils.file_utils import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+
+class IngestCheckpoint:
+    """Durable progress marker of an ingest run. Its presence means the last run did not finish.
+
+    Completed files are recorded in the ingest manifest as they finish; the checkpoint records the run
+    as a whole, the settings it used and how many batches it committed. Chunks committed for files still
+    in progress are found in the store itself on resume."""
+
+    def __init__(self, path: str, store_name: str, data: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.store_name = store_name
+        self.data: Dict[str, Any] = data or {}
+
+    @classmethod
+    def load(cls, path: str, store_name: str) -> Optional["IngestCheckpoint"]:
+        """Return the checkpoint of an interrupted run for this store, or None"""
+        try:
+            if not os.path.exists(path):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != CHECKPOINT_VERSION or data.get("store") != store_name:
+                logger.warning(f"Ignoring ingest checkpoint {path} written for another store or version")
+                return None
+            return cls(path, store_name, data)
+        except Exception as e:
+            logger.warning(f"Could not load ingest checkpoint {path}: {e}")
+            return None
+
+    def start(self, mode: str, fingerprints: Dict[str, str]):
+        """Mark a run as started (or resumed) with the settings it uses"""
+        self.data = {
+            "version": CHECKPOINT_VERSION,
+            "store": self.store_name,
+            "mode": mode,
+            "fingerprints": fingerprints,
+            "started_at": self.data.get("started_at", time.time()),
+            "resumed": self.data.get("resumed", -1) + 1,
+            "sources_done": [],
+            "batches_committed": 0,
+            "chunks_committed": 0
+        }
+        self.save()
+
+    def commit(self, sources_done: List[str], batches: int, chunks: int):
+        """Record progress after the vector store has durably committed it"""
+        self.data.update({
+            "sources_done": sources_done,
+            "batches_committed": batches,
+            "chunks_committed": chunks,
+            "updated_at": time.time()
+        })
+        self.save()
+
+    def save(self):
+        write_json_atomic(self.path, self.data)
+
+    def finish(self):
+        """Remove the checkpoint once the store and manifest are consistent"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
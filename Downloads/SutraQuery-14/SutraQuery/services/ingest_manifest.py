@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+import os
+from typing import List, Dict, Any, Optional, Set
+from utils.file_utils import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 2
+
+
+def file_sha256(filepath: str, block_size: int = 1024 * 1024) -> str:
+    """Hash a source file's bytes"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_hash(doc: Dict[str, Any]) -> str:
+    """Hash everything about a chunk that ends up in the store (text, fields and metadata)"""
+    payload = {key: doc.get(key) for key in ("text", "source", "chapter", "verse", "sanskrit",
+                                             "translation", "explanation", "metadata")}
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]
+
+
+class ChunkIdAssigner:
+    """Assigns stable content-hash ids, disambiguating byte-identical chunks by occurrence within a source"""
+
+    def __init__(self):
+        self._seen: Dict[str, int] = {}
+
+    def assign(self, doc: Dict[str, Any]) -> str:
+        base = chunk_hash(doc)
+        occurrence = self._seen.get(base, 0)
+        self._seen[base] = occurrence + 1
+        if occurrence == 0:
+            return base
+        return hashlib.sha256(f"{base}:{occurrence}".encode('ascii')).hexdigest()[:32]
+
+
+class IngestManifest:
+    """Records, per source, the file hash and the ids of the chunks that are in the vector store"""
+
+    def __init__(self, path: str, store_name: str = "", files: Optional[Dict[str, Dict[str, Any]]] = None,
+                 fingerprints: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.store_name = store_name
+        self.files: Dict[str, Dict[str, Any]] = files or {}
+        # Store-wide settings the indexed vectors depend on, e.g. {"embedding": ...}
+        self.fingerprints: Dict[str, str] = fingerprints or {}
+
+    @classmethod
+    def load(cls, path: str, store_name: str) -> "IngestManifest":
+        """Load the manifest for a store; returns an empty manifest if missing, unreadable or for another store"""
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") != MANIFEST_VERSION:
+                    logger.warning(f"Ignoring manifest {path} with unsupported version {data.get('version')}")
+                elif data.get("store") != store_name:
+                    logger.warning(f"Ignoring manifest {path} written for a different store ({data.get('store')})")
+                else:
+                    return cls(path, store_name, data.get("files", {}), data.get("fingerprints", {}))
+        except Exception as e:
+            logger.warning(f"Could not load ingest manifest {path}: {e}")
+        return cls(path, store_name)
+
+    @property
+    def chunk_count(self) -> int:
+        return sum(len(entry.get("chunks", [])) for entry in self.files.values())
+
+    def all_chunk_ids(self) -> Set[str]:
+        return {doc_id for entry in self.files.values() for doc_id in entry.get("chunks", [])}
+
+    def get_file(self, source_name: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(source_name)
+
+    def is_unchanged(self, source_name: str, filepath: str, sha256: str, parse_fingerprint: str) -> bool:
+        """Whether a file was indexed from the same bytes with the same parser/chunker settings"""
+        entry = self.files.get(source_name)
+        return (bool(entry) and entry.get("path") == filepath and entry.get("sha256") == sha256
+                and entry.get("parse") == parse_fingerprint)
+
+    def set_file(self, source_name: str, filepath: str, sha256: str, chunk_ids: List[str], parse_fingerprint: str,
+                 duplicates: Optional[Dict[str, str]] = None):
+        """Record a file's indexed chunks and the near-duplicates merged into chunks of other sources"""
+        self.files[source_name] = {"path": filepath, "sha256": sha256, "parse": parse_fingerprint, "chunks": chunk_ids}
+        if duplicates:
+            self.files[source_name]["duplicates"] = duplicates
+    
+    def duplicate_targets(self) -> Set[str]:
+        """Ids of the chunks that near-duplicates were merged into"""
+        return {canonical for entry in self.files.values() for canonical in entry.get("duplicates", {}).values()}
+
+    def remove_file(self, source_name: str):
+        self.files.pop(source_name, None)
+
+    def clear(self):
+        self.files = {}
+        self.fingerprints = {}
+
+    def save(self):
+        """Write the manifest atomically so a crash never leaves a truncated file"""
+        write_json_atomic(self.path, {
+            "version": MANIFEST_VERSION,
+            "store": self.store_name,
+            "fingerprints": self.fingerprints,
+            "files": self.files
+        })
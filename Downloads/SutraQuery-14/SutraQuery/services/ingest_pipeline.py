@@ -0,0 +1,393 @@
+import logging
+import sys
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set
+import numpy as np
+from config import Config
+from services.corpus_artifact import CorpusArtifact
+from services.dedup import NearDuplicateIndex, source_reference
+from services.ingest_manifest import IngestManifest, ChunkIdAssigner, file_sha256
+from services.ingest_checkpoint import IngestCheckpoint
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yield successive lists of at most `size` items from an iterable"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (0.0 where unsupported)"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class IngestProgress:
+    """Tracks throughput and memory of an ingest run and logs periodic reports"""
+
+    def __init__(self, report_every: int):
+        self.report_every = max(1, report_every)
+        self.started = time.monotonic()
+        self.batches = 0
+        self.documents = 0
+        self.unchanged = 0
+        self.embedded = 0
+        self.failed = 0
+        self.deleted = 0
+        self.skipped_files = 0
+        self.failed_files: List[str] = []
+        self.duplicates = 0
+        self.duplicate_chars = 0
+        self.duplicates_by_source: Counter = Counter()
+        self.start_rss_mb = peak_rss_mb()
+
+    def add_duplicate(self, doc: Dict[str, Any]):
+        self.duplicates += 1
+        self.duplicate_chars += len(doc.get("text", ""))
+        self.duplicates_by_source[doc.get("source", "")] += 1
+
+    def update(self, batch_size: int, unchanged: int, embedded: int, duplicates: int = 0):
+        self.batches += 1
+        self.documents += batch_size
+        self.unchanged += unchanged
+        self.embedded += embedded
+        self.failed += batch_size - unchanged - embedded - duplicates
+        if self.batches % self.report_every == 0:
+            self.log()
+
+    def log(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.documents / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"Ingested {self.embedded} documents in {self.batches} batches "
+            f"({rate:.0f} docs/s, {self.unchanged} unchanged, {self.duplicates} merged duplicates, "
+            f"{self.deleted} deleted, {self.failed} failed, "
+            f"peak RSS {peak_rss_mb():.0f} MB)"
+        )
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        return {
+            "documents": self.documents,
+            "unchanged": self.unchanged,
+            "embedded": self.embedded,
+            "deleted": self.deleted,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "duplicate_chars": self.duplicate_chars,
+            "duplicates_by_source": dict(self.duplicates_by_source),
+            "skipped_files": self.skipped_files,
+            "failed_files": self.failed_files,
+            "batches": self.batches,
+            "elapsed_seconds": round(elapsed, 2),
+            "docs_per_second": round(self.documents / elapsed, 1) if elapsed > 0 else 0.0,
+            "start_rss_mb": round(self.start_rss_mb, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1)
+        }
+
+
+class IngestPipeline:
+    """Streams parse -> chunk -> embed -> add in fixed-size batches so memory is bounded by batch size.
+
+    Every chunk has a content-hash id. Only chunks whose id is not already in the store are embedded,
+    and ids that disappeared are deleted. Near-duplicate chunks from different sources are merged into the
+    first copy, which keeps references to the others. Progress is committed durably: the store is flushed and the
+    checkpoint written every INGEST_CHECKPOINT_EVERY batches, and each finished file is recorded in the
+    manifest, so an interrupted run resumes from its last committed batch."""
+
+    def __init__(self, doc_processor, api_client, vector_store, manifest: IngestManifest,
+                 checkpoint: IngestCheckpoint, batch_size: int = None):
+        self.config = Config()
+        self.doc_processor = doc_processor
+        self.api_client = api_client
+        self.vector_store = vector_store
+        self.manifest = manifest
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size or self.config.INGEST_BATCH_SIZE
+
+    def parse_fingerprint(self) -> str:
+        """Parser/chunker/dedup settings; a change forces affected files to be re-parsed"""
+        fingerprint = self.doc_processor.parse_fingerprint()
+        if self.config.INGEST_DEDUP_THRESHOLD > 0:
+            fingerprint += f":dedup{self.config.INGEST_DEDUP_THRESHOLD}"
+        return fingerprint
+
+    def embedding_fingerprint(self) -> str:
+        """Embedding settings; a change invalidates every vector in the store"""
+        return self.api_client.embedding_fingerprint()
+
+    def can_update_incrementally(self) -> bool:
+        """Whether the store can be synced from the manifest instead of rebuilt from scratch"""
+        if not self.manifest.files:
+            logger.info("No ingest manifest for this store, a full rebuild is required")
+            return False
+        if self.manifest.fingerprints.get("embedding") != self.embedding_fingerprint():
+            logger.info("Embedding settings changed since the last ingest, a full rebuild is required")
+            return False
+        return True
+
+    def can_resume(self) -> bool:
+        """Whether the interrupted run recorded in the checkpoint can be resumed on top of what it committed.
+        Resuming reconciles the store with the manifest, so this holds even for a full run that crashed
+        before its first file finished, as long as the embedding settings are unchanged."""
+        if self.checkpoint.data.get("fingerprints", {}).get("embedding") != self.embedding_fingerprint():
+            logger.info("Embedding settings changed since the interrupted ingest, a full rebuild is required")
+            return False
+        return True
+
+    def run(self, incremental: bool = False) -> Dict[str, Any]:
+        """Sync the store with all configured data files and return a progress report.
+        In incremental mode unchanged files are skipped and only new or changed chunks are embedded.
+        A full run expects an empty store and manifest."""
+        progress = IngestProgress(self.config.INGEST_PROGRESS_EVERY)
+        parse_fingerprint = self.parse_fingerprint()
+        self.manifest.fingerprints = {"embedding": self.embedding_fingerprint()}
+        self.manifest.save()
+        self.checkpoint.start("incremental" if incremental else "full", {
+            "parse": parse_fingerprint,
+            "embedding": self.embedding_fingerprint()
+        })
+
+        # Reconcile the manifest with what the store actually holds: chunks committed by an
+        # interrupted run are present but unrecorded, and recorded chunks may have been lost
+        recorded = self.manifest.all_chunk_ids()
+        present = self.vector_store.get_document_ids() if incremental else set()
+        uncommitted = present - recorded
+        missing = recorded - present if incremental else set()
+        if uncommitted or missing:
+            logger.info(f"Store holds {len(uncommitted)} chunks not yet in the manifest and lacks {len(missing)} "
+                        f"recorded chunks; reconciling")
+
+        sources = dict(self.doc_processor.iter_source_files())
+        file_hashes = {source_name: file_sha256(filepath) for source_name, filepath in sources.items()}
+        artifact = CorpusArtifact.load(self.config.CORPUS_ARTIFACT_FILE)
+        if artifact is not None:
+            sources, file_hashes = self._add_artifact_sources(artifact, sources, file_hashes)
+        changed = [
+            source_name for source_name, filepath in sources.items()
+            if not incremental
+            or not self.manifest.is_unchanged(source_name, filepath, file_hashes[source_name], parse_fingerprint)
+            or any(doc_id in missing for doc_id in self.manifest.get_file(source_name)["chunks"])
+        ]
+        deleted = 0
+        removed = [name for name in self.manifest.files if name not in sources]
+
+        # Duplicates are merged across sources, so any change can move a canonical chunk to another
+        # source; re-stream every source (only new chunks are embedded) to keep the merge global
+        dedup = NearDuplicateIndex(self.config.INGEST_DEDUP_THRESHOLD) if self.config.INGEST_DEDUP_THRESHOLD > 0 else None
+        if dedup is not None and (changed or removed) and len(changed) < len(sources):
+            logger.info(f"{len(changed)} source(s) changed; re-streaming all {len(sources)} for duplicate detection")
+            changed = list(sources)
+        previous_targets = self.manifest.duplicate_targets()
+        duplicates: Dict[str, Dict[str, str]] = {source_name: {} for source_name in changed}
+        references: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+        # Drop chunks of sources that are no longer configured
+        for source_name in removed:
+            stale = [doc_id for doc_id in self.manifest.get_file(source_name).get("chunks", []) if doc_id not in missing]
+            self.vector_store.delete_documents(stale, persist=False)
+            self.manifest.remove_file(source_name)
+            deleted += len(stale)
+
+        new_ids: Dict[str, List[str]] = {source_name: [] for source_name in changed}
+        old_ids: Dict[str, Set[str]] = {
+            source_name: set((self.manifest.get_file(source_name) or {}).get("chunks", [])) - missing
+            for source_name in changed
+        }
+        assigners = {source_name: ChunkIdAssigner() for source_name in changed}
+        finished: List[str] = []
+        seen: List[str] = []
+        parse_failed: Set[str] = set()
+
+        def finish_source(source_name: str):
+            nonlocal deleted
+            if source_name in parse_failed:
+                # Its chunks were cut short: keep the old chunks and manifest entry so the next run parses it
+                # again; the chunks embedded this run are adopted then
+                logger.warning(f"{source_name} failed to parse; leaving its indexed chunks and manifest entry as they were")
+                finished.append(source_name)
+                return
+            current = set(new_ids[source_name])
+            stale = [doc_id for doc_id in old_ids[source_name] if doc_id not in current]
+            if stale:
+                self.vector_store.delete_documents(stale, persist=False)
+                deleted += len(stale)
+            self.manifest.set_file(source_name, sources[source_name], file_hashes[source_name],
+                                   new_ids[source_name], parse_fingerprint, duplicates[source_name])
+            finished.append(source_name)
+
+        def commit():
+            # Store first, then manifest and checkpoint: on a crash the store can only be ahead,
+            # which the reconciliation above absorbs on resume. flush() raises if the store could not
+            # be written, so the manifest and checkpoint are never ahead of it.
+            self.vector_store.flush()
+            self.manifest.save()
+            self.checkpoint.commit(finished, progress.batches, progress.embedded)
+
+        if changed:
+            logger.info(f"Parsing {len(changed)} changed source(s), skipping {len(sources) - len(changed)} unchanged")
+            documents = self._iter_documents(changed, file_hashes, artifact, parse_failed)
+            for batch in batched(documents, self.batch_size):
+                pending = []
+                merged = 0
+                for doc in batch:
+                    source_name = doc["source"]
+                    if not seen or seen[-1] != source_name:
+                        seen.append(source_name)
+                    doc["id"] = assigners[source_name].assign(doc)
+                    canonical = dedup.check(doc["id"], doc["text"], source_name) if dedup is not None else None
+                    if canonical is not None:
+                        duplicates[source_name][doc["id"]] = canonical
+                        references[canonical].append(source_reference(doc))
+                        progress.add_duplicate(doc)
+                        merged += 1
+                        continue
+                    new_ids[source_name].append(doc["id"])
+                    if doc["id"] in old_ids[source_name]:
+                        continue
+                    if doc["id"] in uncommitted:
+                        # Committed by an interrupted run; adopt it instead of embedding again
+                        uncommitted.discard(doc["id"])
+                        continue
+                    pending.append(doc)
+
+                embedded = self._embed_batch(pending)
+                if embedded:
+                    self.vector_store.add_documents(embedded, persist=False)
+                # Chunks whose embedding failed are not in the store and must not be recorded as indexed
+                failed = {doc["id"] for doc in pending} - {doc["id"] for doc in embedded}
+                if failed:
+                    for source_name in {doc["source"] for doc in pending}:
+                        new_ids[source_name] = [doc_id for doc_id in new_ids[source_name] if doc_id not in failed]
+                progress.update(len(batch), len(batch) - len(pending) - merged, len(embedded), merged)
+
+                # Sources are streamed in order, so every source before the current one is complete
+                for source_name in seen[:-1]:
+                    if source_name not in finished:
+                        finish_source(source_name)
+                        commit()
+                if progress.batches % self.config.INGEST_CHECKPOINT_EVERY == 0:
+                    commit()
+
+        # Includes sources that produced no chunks at all
+        for source_name in changed:
+            if source_name not in finished:
+                finish_source(source_name)
+
+        # Chunks left behind by an interrupted run that no current file produces
+        if uncommitted:
+            self.vector_store.delete_documents(list(uncommitted), persist=False)
+            deleted += len(uncommitted)
+
+        if dedup is not None and changed:
+            self._update_references(new_ids, duplicates, references, previous_targets)
+
+        commit()
+        self.checkpoint.finish()
+
+        progress.deleted = deleted
+        progress.skipped_files = len(sources) - len(changed)
+        progress.failed_files = sorted(parse_failed)
+        progress.log()
+        if progress.duplicates:
+            logger.info(f"Merged {progress.duplicates} near-duplicate chunks ({progress.duplicate_chars} characters) "
+                        f"into chunks of other sources: {dict(progress.duplicates_by_source)}")
+        return progress.report()
+
+    def _add_artifact_sources(self, artifact: CorpusArtifact, sources: Dict[str, str],
+                              file_hashes: Dict[str, str]):
+        """Include sources that only exist in the corpus artifact (a node shipped without the raw files)"""
+        parse_fingerprint = self.doc_processor.parse_fingerprint()
+        ordered_sources, ordered_hashes = {}, {}
+        for source_name in self.config.get_data_files():
+            if source_name in sources:
+                ordered_sources[source_name] = sources[source_name]
+                ordered_hashes[source_name] = file_hashes[source_name]
+            elif source_name in artifact.sources:
+                entry = artifact.sources[source_name]
+                if entry.get("parse") != parse_fingerprint:
+                    logger.warning(f"Corpus artifact copy of {source_name} was built with other parser settings "
+                                   f"and its file is missing; skipping it")
+                    continue
+                ordered_sources[source_name] = entry["path"]
+                ordered_hashes[source_name] = entry["sha256"]
+        return ordered_sources, ordered_hashes
+
+    def _iter_documents(self, changed: List[str], file_hashes: Dict[str, str], artifact: Optional[CorpusArtifact],
+                        parse_failed: Set[str]) -> Iterator[Dict[str, Any]]:
+        """Chunk records of the changed sources in source order, read from the corpus artifact where it is
+        current for a file and parsed otherwise. Sources whose file fails to parse are added to parse_failed."""
+        parse_fingerprint = self.doc_processor.parse_fingerprint()
+        from_artifact = {
+            source_name for source_name in changed
+            if artifact is not None and artifact.matches(source_name, file_hashes[source_name], parse_fingerprint)
+        }
+        to_parse = set(changed) - from_artifact
+        if from_artifact:
+            logger.info(f"Reading {len(from_artifact)} source(s) from corpus artifact {artifact.path}, "
+                        f"parsing {len(to_parse)}")
+
+        parsed = iter(self.doc_processor.iter_all_files(sources=to_parse, failed=parse_failed)) if to_parse else iter(())
+        pending = next(parsed, None)
+        for source_name in changed:
+            if source_name in from_artifact:
+                yield from artifact.iter_source(source_name)
+                continue
+            while pending is not None and pending["source"] == source_name:
+                yield pending
+                pending = next(parsed, None)
+
+    def _update_references(self, new_ids: Dict[str, List[str]], duplicates: Dict[str, Dict[str, str]],
+                           references: Dict[str, List[Dict[str, Any]]], previous_targets: Set[str]):
+        """Attach the source references of merged duplicates to their canonical chunks in the store"""
+        stored = {doc_id for ids in new_ids.values() for doc_id in ids}
+        # A canonical chunk whose embedding failed is not in the store; its duplicates are dropped this run
+        lost = [canonical for canonical in references if canonical not in stored]
+        if lost:
+            logger.warning(f"{len(lost)} chunks with merged duplicates failed to embed; their duplicates are not indexed")
+            for source_duplicates in duplicates.values():
+                for doc_id in [doc_id for doc_id, canonical in source_duplicates.items() if canonical not in stored]:
+                    del source_duplicates[doc_id]
+        # Canonical chunks that lost all their duplicates get their references cleared
+        updates = {
+            canonical: references.get(canonical, [])
+            for canonical in set(references) | previous_targets
+            if canonical in stored
+        }
+        if updates:
+            self.vector_store.set_duplicate_references(updates, persist=False)
+
+    def _embed_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach embeddings to a batch with batched embedding requests, dropping documents whose embedding failed"""
+        try:
+            embeddings = self.api_client.get_embeddings([doc["text"] for doc in batch], fallback=False)
+        except Exception as e:
+            logger.error(f"Error generating embeddings for a batch of {len(batch)} documents: {e}")
+            return []
+
+        embedded = []
+        for doc, embedding in zip(batch, embeddings):
+            if np.isnan(embedding).any():
+                logger.error(f"Error generating embedding for document from {doc.get('source', '')}")
+                continue
+            doc["embedding"] = embedding
+            embedded.append(doc)
+        return embedded
@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Bump when tokenization, feature hashing or the projection changes; saved models of another version are refused
+LOCAL_EMBEDDER_VERSION = 1
+
+# Words, keeping Devanagari vowel signs and viramas inside the word
+_TOKEN = re.compile(r'[\w\u0900-\u097f]+')
+
+# Mixes the hashes of two words into the hash of their bigram
+_BIGRAM_MULTIPLIER = np.uint64(0x9E3779B1)
+
+# Below this many texts per worker, encoding in a pool costs more than it saves
+_MIN_TEXTS_PER_WORKER = 256
+
+# Word hashes are memoized per process; the vocabulary of a corpus is small, but the memo is bounded anyway
+_MAX_MEMO = 1 << 20
+
+_worker_embedder = None
+
+
+def _init_worker(params: Dict[str, Any], idf: np.ndarray):
+    """Rebuild the embedder once per pool worker (the projection is regenerated from its seed)"""
+    global _worker_embedder
+    _worker_embedder = LocalEmbedder(idf=idf, **params)
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _worker_embedder._encode(texts)
+
+
+class LocalEmbedder:
+    """Offline semantic embeddings: hashed TF-IDF over words and word bigrams, reduced to `dim` values
+    with a sparse random projection and L2-normalized, so inner products approximate TF-IDF cosine
+    similarity. Fitting learns the IDF weights from the corpus; the projection is fixed by the seed.
+    Needs no network or GPU, encodes batches with NumPy and can spread large batches over processes."""
+
+    def __init__(self, dim: int = 1024, n_features: int = 1 << 18, nonzeros: int = 8, seed: int = 1,
+                 idf: Optional[np.ndarray] = None, n_docs: int = 0):
+        self.dim = dim
+        self.n_features = n_features
+        self.nonzeros = nonzeros
+        self.seed = seed
+        self.n_docs = n_docs
+        self.idf = idf if idf is not None else np.ones(n_features, dtype=np.float32)
+
+        # Each feature adds +-1/sqrt(nonzeros) to `nonzeros` random output dimensions
+        rng = np.random.default_rng(seed)
+        self._columns = rng.integers(0, dim, (n_features, nonzeros), dtype=np.int32).astype(np.int16 if dim < 32768 else np.int32)
+        self._signs = rng.choice(np.array([-1, 1], dtype=np.int8), (n_features, nonzeros))
+        self._scale = np.float32(1.0 / np.sqrt(nonzeros))
+        self._memo: Dict[str, int] = {}
+        self._executor = None
+        self._executor_workers = 0
+
+    def fingerprint(self) -> str:
+        """Identifies the model; vectors from embedders with different fingerprints are not comparable"""
+        digest = hashlib.sha256(self.idf.tobytes())
+        digest.update(f"{self.dim}:{self.n_features}:{self.nonzeros}:{self.seed}".encode())
+        return f"local-tfidf:v{LOCAL_EMBEDDER_VERSION}:{digest.hexdigest()[:12]}"
+
+    def _features(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Distinct (row, feature) pairs of a batch of texts with their term counts"""
+        memo = self._memo
+        if len(memo) > _MAX_MEMO:
+            memo.clear()
+        hashes = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            tokens = _TOKEN.findall(text.lower())
+            lengths[i] = len(tokens)
+            for token in tokens:
+                value = memo.get(token)
+                if value is None:
+                    value = memo[token] = zlib.crc32(token.encode('utf-8'))
+                hashes.append(value)
+
+        words = np.array(hashes, dtype=np.uint64)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        # Bigrams of adjacent words within the same text
+        same_text = rows[:-1] == rows[1:]
+        bigrams = (words[:-1][same_text] * _BIGRAM_MULTIPLIER) ^ (words[1:][same_text] << np.uint64(7))
+        features = np.concatenate([words, bigrams]) % np.uint64(self.n_features)
+        feature_rows = np.concatenate([rows, rows[:-1][same_text]])
+
+        keys, counts = np.unique(feature_rows * self.n_features + features.astype(np.int64), return_counts=True)
+        return keys // self.n_features, keys % self.n_features, counts
+
+    def fit(self, texts: List[str], batch_size: int = 4096) -> "LocalEmbedder":
+        """Learn smoothed IDF weights from the document frequency of every feature in texts"""
+        document_frequency = np.zeros(self.n_features, dtype=np.int64)
+        for start in range(0, len(texts), batch_size):
+            _, features, _ = self._features(texts[start:start + batch_size])
+            document_frequency += np.bincount(features, minlength=self.n_features)
+        self.n_docs = len(texts)
+        self.idf = (np.log((1 + self.n_docs) / (1 + document_frequency)) + 1).astype(np.float32)
+        logger.info(f"Fitted local embedder on {self.n_docs} texts "
+                    f"({np.count_nonzero(document_frequency)} of {self.n_features} features used)")
+        return self
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        rows, features, counts = self._features(texts)
+        weights = (1 + np.log(counts)).astype(np.float32) * self.idf[features] * self._scale
+        columns = rows[:, None] * self.dim + self._columns[features]
+        values = weights[:, None] * self._signs[features]
+        embeddings = np.bincount(columns.ravel(), weights=values.ravel(),
+                                 minlength=len(texts) * self.dim).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts: List[str], workers: int = 1) -> np.ndarray:
+        """Embed texts as a float32 matrix of unit rows (all zeros for texts without words).
+        With more than one worker, large batches are split over a process pool kept for later calls."""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        workers = min(workers, len(texts) // _MIN_TEXTS_PER_WORKER)
+        if workers <= 1:
+            return self._encode(texts)
+
+        executor = self._pool(workers)
+        bounds = [len(texts) * i // workers for i in range(workers + 1)]
+        parts = executor.map(_encode_in_worker, [texts[bounds[i]:bounds[i + 1]] for i in range(workers)])
+        return np.concatenate(list(parts))
+
+    def _pool(self, workers: int) -> ProcessPoolExecutor:
+        if self._executor is None or self._executor_workers < workers:
+            self.close()
+            params = {"dim": self.dim, "n_features": self.n_features, "nonzeros": self.nonzeros,
+                      "seed": self.seed, "n_docs": self.n_docs}
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                 initargs=(params, self.idf))
+            self._executor_workers = workers
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def save(self, path: str):
+        """Write the model to a temp file and rename it into place"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version=LOCAL_EMBEDDER_VERSION, dim=self.dim, n_features=self.n_features,
+                     nonzeros=self.nonzeros, seed=self.seed, n_docs=self.n_docs, idf=self.idf)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        logger.info(f"Saved local embedder {self.fingerprint()} to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LocalEmbedder"]:
+        """Load a saved model; None if there is none or it cannot be used"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != LOCAL_EMBEDDER_VERSION:
+                    logger.error(f"Local embedder {path} has version {int(data['version'])}, "
+                                 f"expected {LOCAL_EMBEDDER_VERSION}; refit it")
+                    return None
+                return cls(dim=int(data["dim"]), n_features=int(data["n_features"]), nonzeros=int(data["nonzeros"]),
+                           seed=int(data["seed"]), idf=data["idf"].astype(np.float32), n_docs=int(data["n_docs"]))
+        except Exception as e:
+            logger.error(f"Error loading local embedder from {path}: {e}")
+            return None
+
+
+def main():
+    from services.document_processor import DocumentProcessor
+
+    parser = argparse.ArgumentParser(description="Fit or inspect the local TF-IDF embedder")
+    parser.add_argument('--path', default=Config.EMBEDDING_LOCAL_MODEL_FILE, help='Model file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    fit = subparsers.add_parser('fit', help='Fit the IDF weights on the chunks of every configured data file')
+    fit.add_argument('--workers', type=int, default=None, help='Parse processes (default INGEST_WORKERS)')
+    subparsers.add_parser('info', help='Show the saved model')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.command == 'fit':
+        texts = [doc["text"] for doc in DocumentProcessor().iter_all_files(args.workers) if doc.get("text")]
+        embedder = LocalEmbedder().fit(texts)
+        embedder.save(args.path)
+        print(f"{args.path}: {embedder.fingerprint()}, fitted on {embedder.n_docs} chunks. "
+              f"The next ingest rebuilds the index with local embeddings unless EMBEDDING_USE_API is set.")
+    else:
+        embedder = LocalEmbedder.load(args.path)
+        if embedder is None:
+            print(f"No usable local embedder at {args.path}")
+            sys.exit(1)
+        print(f"{args.path}: {embedder.fingerprint()}, fitted on {embedder.n_docs} chunks, "
+              f"{embedder.dim} dimensions, {embedder.n_features} hashed features")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Set
+from config import Config
+from utils.text_utils import TextNormalizer
+
+logger = logging.getLogger(__name__)
+
+# Keyword sets read from the keywords file; each is a list of lowercase words or phrases
+KEYWORD_SETS = ("domain_keywords", "off_topic_keywords", "hindi_question_patterns", "question_patterns")
+
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """Regex alternation of keywords factored into a character trie, so matching at a position costs
+    the length of the longest keyword there instead of one attempt per keyword. Longer keywords are
+    tried first; a shorter one matches only if the longer ones fail."""
+    trie: Dict[str, Any] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class QueryPreprocessor:
+    """Normalization, domain gating and verse-reference extraction for user questions.
+    All keyword sets are matched by one compiled automaton, and results are cached per question."""
+
+    def __init__(self, keywords_file: Optional[str] = None, cache_size: int = 4096):
+        self.config = Config()
+        self.keywords_file = keywords_file or self.config.QUERY_KEYWORDS_FILE
+        self.keyword_sets = self._load_keywords(self.keywords_file)
+
+        # Sets matched by each keyword, including those of shorter keywords that are whole-word prefixes
+        # of it ("purpose of" also counts as "purpose"), since only the longest match at a position is reported
+        self._sets_by_keyword: Dict[str, Set[str]] = {}
+        for name, keywords in self.keyword_sets.items():
+            for keyword in keywords:
+                self._sets_by_keyword.setdefault(keyword, set()).add(name)
+        for keyword, sets in self._sets_by_keyword.items():
+            words = keyword.split(" ")
+            for i in range(1, len(words)):
+                sets.update(self._sets_by_keyword.get(" ".join(words[:i]), ()))
+
+        # Zero-width match at every word start so keywords may overlap; an optional plural "s" is allowed
+        self._pattern = None
+        if self._sets_by_keyword:
+            self._pattern = re.compile(rf"\b(?=({_trie_pattern(list(self._sets_by_keyword))})s?\b)")
+        self.analyze = lru_cache(maxsize=cache_size)(self._analyze)
+
+    @staticmethod
+    def _load_keywords(path: str) -> Dict[str, List[str]]:
+        """Read the keyword sets; a missing file or set leaves that set empty"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading query keywords from {path}: {e}")
+            data = {}
+        keyword_sets = {}
+        for name in KEYWORD_SETS:
+            normalized = (TextNormalizer.normalize_query(keyword) for keyword in data.get(name, []))
+            keyword_sets[name] = sorted({keyword for keyword in normalized if keyword})
+        logger.info(f"Loaded query keywords: { {name: len(keywords) for name, keywords in keyword_sets.items()} }")
+        return keyword_sets
+
+    def match_keywords(self, normalized_question: str) -> Dict[str, List[str]]:
+        """Keywords of each set found as whole words in an already normalized question"""
+        matches: Dict[str, List[str]] = {name: [] for name in KEYWORD_SETS}
+        if self._pattern is None:
+            return matches
+        for keyword in self._pattern.findall(normalized_question):
+            for name in self._sets_by_keyword[keyword]:
+                matches[name].append(keyword)
+        return matches
+
+    def _analyze(self, question: str) -> Dict[str, Any]:
+        """Normalized question, domain decision, keyword matches and verse reference (shared; do not modify)"""
+        normalized = TextNormalizer.normalize_query(question or "")
+        matches = self.match_keywords(normalized)
+        length = len((question or "").strip())
+
+        # Off-topic keywords reject the question. Otherwise accept domain keywords, Hindi questions
+        # about characters or relationships, and general spiritual or philosophical questions.
+        # Without any keywords (e.g. the file could not be read) the gate lets everything through.
+        if not self._sets_by_keyword:
+            in_domain = True
+        elif matches["off_topic_keywords"]:
+            in_domain = False
+        else:
+            in_domain = bool(matches["domain_keywords"]
+                             or (matches["hindi_question_patterns"] and length > 5)
+                             or (matches["question_patterns"] and length > 10))
+
+        return {
+            "normalized": normalized,
+            "in_domain": in_domain,
+            "matches": {name: tuple(keywords) for name, keywords in matches.items()},
+            "verse_reference": TextNormalizer.extract_verse_reference(normalized)
+        }
+
+    def is_domain_question(self, question: str) -> bool:
+        """Whether a question is about the texts this service covers"""
+        return self.analyze(question)["in_domain"]
+
+    def cache_info(self) -> Dict[str, int]:
+        """Hit and miss counts of the analysis cache"""
+        info = self.analyze.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
@@ -1,16 +1,35 @@
 import logging
+import os
 import time
-from typing import List, Dict, Any, Optional
-from services.api_client import APIClient
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+import numpy as np
+from services.api_client import APIClient, ANSWER_UNAVAILABLE_MESSAGE
 from services.vector_store import VectorStore
 from services.faiss_vector_store import FaissVectorStore
 from services.document_processor import DocumentProcessor
+from services.ingest_pipeline import IngestPipeline
+from services.ingest_manifest import IngestManifest
+from services.ingest_checkpoint import IngestCheckpoint
+from services.query_preprocessor import QueryPreprocessor
+from services.answer_cache import AnswerCache
+from services.single_flight import SingleFlight
+from services.resilience import Deadline, DeadlineExceeded
+from services.async_runtime import run_sync
+from config import Config
 from utils.text_utils import TextNormalizer
+from utils.lru_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
+SEARCH_ERROR_MESSAGE = "I encountered an issue while searching for your answer. This might be due to a temporary service interruption. Please try rephrasing your question or try again in a moment."
+
+DEGRADED_ANSWER_MESSAGE = "I couldn't generate an answer right now, but these passages from the texts are the most relevant to your question:"
+
+TIMED_OUT_SEARCH_MESSAGE = "I couldn't search the texts in time because a service is temporarily slow or unavailable. Please try again in a few moments."
+
 class RAGService:
     def __init__(self):
+        self.config = Config()
         self.api_client = APIClient()
         
         # Try Qdrant first, fallback to FAISS
@@ -21,117 +40,303 @@ class RAGService:
         
         self.doc_processor = DocumentProcessor()
         self.normalizer = TextNormalizer()
+        self.query_preprocessor = QueryPreprocessor()
+        self.query_embedding_cache = LRUCache(self.config.QUERY_EMBEDDING_CACHE_SIZE,
+                                              self.config.QUERY_EMBEDDING_CACHE_TTL or None)
+        self.answer_cache = AnswerCache(self.config.ANSWER_CACHE_SIZE, self.config.ANSWER_CACHE_TTL or None,
+                                        self.config.ANSWER_CACHE_SIMILARITY)
+        # Concurrent identical questions (and query embeddings) share one in-flight computation
+        self.answer_flights = SingleFlight()
+        self.embedding_flights = SingleFlight()
+        self.degraded_answers = 0
     
-    def initialize_database(self, force_reload: bool = False):
-        """Initialize the vector database with documents"""
+    def initialize_database(self, force_reload: bool = False, full_rebuild: bool = False) -> Dict[str, Any]:
+        """Initialize the vector database with documents and return an ingest report.
+        A forced reload syncs the store from the ingest manifest (re-embedding only new or changed chunks)
+        unless full_rebuild is set or the manifest does not match the store. A run that was interrupted
+        is resumed from its last checkpoint."""
         try:
+            manifest = IngestManifest.load(self.config.INGEST_MANIFEST_FILE, self.vector_store.store_name)
+            checkpoint = IngestCheckpoint.load(self.config.INGEST_CHECKPOINT_FILE, self.vector_store.store_name)
+            interrupted = checkpoint is not None
+            if checkpoint is None:
+                checkpoint = IngestCheckpoint(self.config.INGEST_CHECKPOINT_FILE, self.vector_store.store_name)
+            pipeline = IngestPipeline(self.doc_processor, self.api_client, self.vector_store, manifest, checkpoint)
+            
             # Check if collection already has data
             info = self.vector_store.get_collection_info()
-            if info.get("points_count", 0) > 0 and not force_reload:
-                logger.info(f"Database already initialized with {info['points_count']} documents")
-                return
+            points_count = info.get("points_count", 0) or 0
+            if points_count > 0 and not force_reload and not interrupted:
+                logger.info(f"Database already initialized with {points_count} documents")
+                return {"skipped": True, "points_count": points_count}
             
-            if force_reload:
-                logger.info("Force reloading database...")
-                self.vector_store.clear_collection()
-            
-            # Process all documents
-            logger.info("Processing documents...")
-            documents = self.doc_processor.process_all_files()
-            
-            if not documents:
-                logger.warning("No documents found to process")
-                return
+            if interrupted and not full_rebuild and pipeline.can_resume():
+                logger.info(f"Resuming interrupted ingest from checkpoint "
+                            f"({checkpoint.data.get('batches_committed', 0)} batches committed)")
+                incremental = True
+            else:
+                incremental = (force_reload and not full_rebuild and points_count > 0
+                               and pipeline.can_update_incrementally())
             
-            # Generate embeddings for all documents (using hash-based for bulk loading)
-            logger.info("Generating embeddings for bulk loading...")
-            for i, doc in enumerate(documents):
-                try:
-                    # Use hash-based embeddings for bulk loading to avoid rate limits
-                    embedding = self.api_client.get_embedding(doc["text"], use_api=False)
-                    doc["embedding"] = embedding
-                    
-                    if (i + 1) % 1000 == 0:
-                        logger.info(f"Generated embeddings for {i + 1}/{len(documents)} documents")
-                        
-                except Exception as e:
-                    logger.error(f"Error generating embedding for document {i}: {e}")
-                    continue
+            if incremental:
+                logger.info("Syncing database incrementally from the ingest manifest...")
+            else:
+                if force_reload or interrupted:
+                    logger.info("Force reloading database...")
+                    self.vector_store.clear_collection()
+                manifest.clear()
             
-            # Filter out documents without embeddings
-            valid_documents = [doc for doc in documents if "embedding" in doc]
-            logger.info(f"Generated embeddings for {len(valid_documents)} documents")
+            # Stream documents through parse -> chunk -> embed -> add in fixed-size batches
+            logger.info("Processing documents and generating embeddings for bulk loading...")
+            report = pipeline.run(incremental=incremental)
+            report["incremental"] = incremental
+            report["resumed"] = interrupted and incremental
+            self.answer_cache.clear()
             
-            # Add to vector store
-            if valid_documents:
-                self.vector_store.add_documents(valid_documents)
-                logger.info("Database initialization completed successfully")
-            else:
+            if incremental:
+                logger.info(f"Incremental database sync completed: {report}")
+            elif report["documents"] == 0:
+                logger.warning("No documents found to process")
+            elif report["embedded"] == 0:
                 logger.error("No valid documents with embeddings to add to database")
+            else:
+                logger.info(f"Database initialization completed successfully: {report}")
+            
+            return report
                 
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
             raise
     
     def search_and_answer(self, question: str, source_filter: Optional[str] = None) -> Dict[str, Any]:
-        """Search for relevant documents and generate an answer"""
+        """Search for relevant documents and generate an answer (blocks on the background event loop;
+        see asearch_and_answer)"""
+        return run_sync(self.asearch_and_answer(question, source_filter))
+    
+    async def asearch_and_answer(self, question: str, source_filter: Optional[str] = None) -> Dict[str, Any]:
+        """Search for relevant documents and generate an answer. Runs on the background event loop, where
+        the embedding, vector search and completion calls of every in-flight question are awaited together.
+        A question asked again (after normalization, with the same filter) while it is still being answered
+        waits for that answer instead of starting its own. The whole computation has REQUEST_DEADLINE
+        seconds; when generation fails or runs out of time, the reply is made of the retrieved passages, and
+        when time runs out before any passage is retrieved, it is a short degraded notice."""
+        key = (source_filter, self.query_preprocessor.analyze(question)["normalized"])
+        return await self.answer_flights.run(key, lambda: self._asearch_and_answer(question, source_filter))
+    
+    async def _asearch_and_answer(self, question: str, source_filter: Optional[str]) -> Dict[str, Any]:
+        deadline = Deadline(self.config.REQUEST_DEADLINE)
         try:
-            # Check if question is related to Hindu texts
-            if not self._is_hindu_text_related(question):
-                return {
-                    "answer": "I can only answer questions about Hindu religious texts including the Bhagavad Gita, Ramayana, Mahabharata, and Yoga Sutras. Please ask questions related to these sacred texts, their teachings, characters, or philosophical concepts.",
-                    "confidence": 0.0
-                }
+            cached, cache_key, query_embedding = await deadline.run(
+                self._alookup_answer(question, source_filter, deadline), "answer cache lookup")
+            if cached is not None:
+                return cached
             
-            # Normalize the question
-            normalized_question = self.normalizer.normalize_query(question)
+            reply, top_results, context = await deadline.run(
+                self._aretrieve(question, source_filter, deadline, query_embedding), "retrieval")
+            if reply is not None:
+                return reply
             
-            # Generate embedding for the question
-            question_embedding = self.api_client.get_embedding(normalized_question)
-            
-            # Search for relevant documents with expanded scope
-            search_results = self.vector_store.search(
-                query_embedding=question_embedding,
-                limit=20,  # Get more results to improve chances of finding relevant content
-                source_filter=source_filter
-            )
-            
-            if not search_results:
-                return {
-                    "answer": "Based on the available texts, I cannot find relevant information to answer this question. Please try rephrasing your question or asking about specific verses or concepts from the Bhagavad Gita or Yoga Sutras.",
-                    "confidence": 0.0
-                }
-            
-            # Prepare context from search results
-            context_parts = []
-            
-            for result in search_results[:5]:  # Use top 5 results
-                # Format the context entry
-                context_entry = self._format_context_entry(result)
-                context_parts.append(context_entry)
-            
-            context = "\n\n---\n\n".join(context_parts)
+            # Calculate average confidence score
+            avg_confidence = sum(result["score"] for result in top_results) / len(top_results)
             
             # Generate answer
-            answer = self.api_client.generate_answer(question, context)
-            
-            # Calculate average confidence score
-            avg_confidence = sum(result["score"] for result in search_results[:5]) / len(search_results[:5])
+            try:
+                answer = await deadline.run(self.api_client.agenerate_answer(question, context, deadline), "generation")
+            except DeadlineExceeded as e:
+                logger.warning(f"{e}, answering with the retrieved passages")
+                answer = None
+            if answer is None or answer == ANSWER_UNAVAILABLE_MESSAGE:
+                return self._degraded_answer(top_results, avg_confidence)
             
-            return {
+            result = {
                 "answer": answer,
                 "confidence": avg_confidence,
-                "context_used": len(context_parts)
+                "context_used": len(top_results)
             }
+            self._store_answer(cache_key, result)
+            return result
             
+        except DeadlineExceeded as e:
+            # Out of time before any passage was retrieved
+            logger.warning(f"{e}, answering without passages")
+            return self._timed_out_answer()
         except Exception as e:
             logger.error(f"Error in search_and_answer: {e}")
             return {
-                "answer": "I encountered an issue while searching for your answer. This might be due to a temporary service interruption. Please try rephrasing your question or try again in a moment.",
+                "answer": SEARCH_ERROR_MESSAGE,
                 "confidence": 0.0,
                 "error": str(e)
             }
     
+    async def astream_search_and_answer(self, question: str, source_filter: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream the answer to a question as (event, data) pairs: "sources" with the retrieved passages as
+        soon as the search finishes, then "token" for each piece of the answer as the provider streams it,
+        and finally "done" (or "answer" with a complete reply when no answer is generated, or "error").
+        If generation fails before the first token (e.g. the provider did not respond within the deadline),
+        the final event is "answer" with the retrieved passages; if the deadline runs out before retrieval
+        finishes, the only event is "answer" with a degraded notice. Closing the iterator cancels the provider request."""
+        deadline = Deadline(self.config.REQUEST_DEADLINE)
+        try:
+            cached, cache_key, query_embedding = await deadline.run(
+                self._alookup_answer(question, source_filter, deadline), "answer cache lookup")
+            if cached is not None:
+                yield "answer", cached
+                return
+            
+            reply, top_results, context = await deadline.run(
+                self._aretrieve(question, source_filter, deadline, query_embedding), "retrieval")
+            if reply is not None:
+                yield "answer", reply
+                return
+            
+            confidence = sum(result["score"] for result in top_results) / len(top_results)
+            yield "sources", {
+                "sources": [
+                    {
+                        "source": result["source"],
+                        "chapter": result["chapter"],
+                        "verse": result["verse"],
+                        "score": result["score"]
+                    }
+                    for result in top_results
+                ],
+                "confidence": confidence,
+                "context_used": len(top_results)
+            }
+        except DeadlineExceeded as e:
+            logger.warning(f"{e}, answering without passages")
+            yield "answer", self._timed_out_answer()
+            return
+        except Exception as e:
+            logger.error(f"Error in stream_search_and_answer: {e}")
+            yield "error", {"answer": SEARCH_ERROR_MESSAGE, "error": str(e)}
+            return
+        
+        tokens = []
+        try:
+            async for token in self.api_client.astream_answer(question, context, deadline):
+                tokens.append(token)
+                yield "token", token
+            self._store_answer(cache_key, {
+                "answer": "".join(tokens),
+                "confidence": confidence,
+                "context_used": len(top_results)
+            })
+            yield "done", {}
+        except Exception as e:
+            logger.error(f"Error streaming answer with OpenRouter: {e}")
+            if tokens:
+                yield "error", {"answer": ANSWER_UNAVAILABLE_MESSAGE, "error": str(e)}
+            else:
+                yield "answer", self._degraded_answer(top_results, confidence)
+    
+    def _degraded_answer(self, top_results: List[Dict[str, Any]], confidence: float) -> Dict[str, Any]:
+        """Reply made of the retrieved passages, for when no answer could be generated in time (not cached)"""
+        self.degraded_answers += 1
+        # The best three passages; all five would make a long reply
+        passages = [self._format_context_entry(result) for result in top_results[:3]]
+        return {
+            "answer": "\n\n".join([DEGRADED_ANSWER_MESSAGE] + passages),
+            "confidence": confidence,
+            "context_used": len(top_results),
+            "degraded": True
+        }
+    
+    def _timed_out_answer(self) -> Dict[str, Any]:
+        """Reply for when the deadline ran out before retrieval finished, so there are no passages to offer (not cached)"""
+        self.degraded_answers += 1
+        return {
+            "answer": TIMED_OUT_SEARCH_MESSAGE,
+            "confidence": 0.0,
+            "context_used": 0,
+            "degraded": True
+        }
+    
+    def _index_version(self) -> str:
+        """Changes whenever the index is rebuilt or synced (by any process): the embedding fingerprint and
+        the modification time of the ingest manifest, which every ingest rewrites"""
+        try:
+            manifest_mtime = os.stat(self.config.INGEST_MANIFEST_FILE).st_mtime_ns
+        except OSError:
+            manifest_mtime = 0
+        return f"{self.api_client.embedding_fingerprint()}:{manifest_mtime}"
+    
+    async def _alookup_answer(self, question: str, source_filter: Optional[str], deadline: Optional[Deadline] = None
+                              ) -> Tuple[Optional[Dict[str, Any]], Optional[tuple], Optional[List[float]]]:
+        """Cached answer for a question (exact, then semantic), the key to store a new answer under, and the
+        query embedding if the semantic lookup computed one, so retrieval does not embed the question again.
+        Off-topic questions are neither looked up nor stored."""
+        if self.config.ANSWER_CACHE_SIZE <= 0 or not self._is_hindu_text_related(question):
+            return None, None, None
+        
+        analysis = self.query_preprocessor.analyze(question)
+        normalized = analysis["normalized"]
+        # Questions about different verses can be worded almost identically, so the verse is part of the scope
+        scope = (source_filter, analysis["verse_reference"])
+        version = self._index_version()
+        cached = self.answer_cache.get_exact(version, scope, normalized)
+        match = "exact"
+        query_embedding = None
+        embedding = None
+        if cached is None:
+            # Hash-based embeddings carry no meaning, so they cannot match similar questions; neither can
+            # the hash-based fallback of a failed API call, which is also kept out of the cache
+            if self.api_client.embedding_fingerprint() != "hash-md5":
+                query_embedding, fallback = await self._aembed_query(normalized, deadline)
+                if not fallback:
+                    embedding = np.asarray(query_embedding, dtype=np.float32)
+            cached = self.answer_cache.get_similar(version, scope, embedding)
+            match = "semantic"
+        if cached is not None:
+            return {**cached, "cached": match}, None, None
+        return None, (version, scope, normalized, embedding), query_embedding
+    
+    def _store_answer(self, cache_key: Optional[tuple], result: Dict[str, Any]):
+        """Cache a generated answer; failed generations are not cached"""
+        if cache_key is None or not result.get("answer") or result["answer"] == ANSWER_UNAVAILABLE_MESSAGE:
+            return
+        version, scope, normalized, embedding = cache_key
+        self.answer_cache.put(version, scope, normalized, embedding, result)
+    
+    async def _aretrieve(self, question: str, source_filter: Optional[str], deadline: Optional[Deadline] = None,
+                         question_embedding: Optional[List[float]] = None
+                         ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], str]:
+        """Domain check, query embedding (unless already computed by the answer cache lookup) and vector
+        search for a question. Returns a complete reply when no answer should be generated, else the top
+        results and the context built from them."""
+        # Check if question is related to Hindu texts
+        if not self._is_hindu_text_related(question):
+            return {
+                "answer": "I can only answer questions about Hindu religious texts including the Bhagavad Gita, Ramayana, Mahabharata, and Yoga Sutras. Please ask questions related to these sacred texts, their teachings, characters, or philosophical concepts.",
+                "confidence": 0.0
+            }, [], ""
+        
+        if question_embedding is None:
+            # Normalize the question (cached by the preprocessor along with the domain check)
+            normalized_question = self.query_preprocessor.analyze(question)["normalized"]
+            
+            # Generate embedding for the question (repeated questions come from the cache)
+            question_embedding, _ = await self._aembed_query(normalized_question, deadline)
+        
+        # Search for relevant documents with expanded scope
+        search_results = await self.vector_store.asearch(
+            query_embedding=question_embedding,
+            limit=20,  # Get more results to improve chances of finding relevant content
+            source_filter=source_filter
+        )
+        
+        if not search_results:
+            return {
+                "answer": "Based on the available texts, I cannot find relevant information to answer this question. Please try rephrasing your question or asking about specific verses or concepts from the Bhagavad Gita or Yoga Sutras.",
+                "confidence": 0.0
+            }, [], ""
+        
+        # Prepare context from the top 5 results
+        top_results = search_results[:5]
+        context_parts = [self._format_context_entry(result) for result in top_results]
+        context = "\n\n---\n\n".join(context_parts)
+        return None, top_results, context
+    
     def _format_context_entry(self, result: Dict[str, Any]) -> str:
         """Format a search result for use as context"""
         parts = []
@@ -142,6 +347,15 @@ class RAGService:
         else:
             parts.append(f"Source: {result['source']}")
         
+        # Near-duplicates from other sources were merged into this chunk at ingest time
+        duplicates = result.get("metadata", {}).get("duplicates", [])
+        if duplicates:
+            also_in = sorted({
+                f"{ref['source']} {ref['chapter']}.{ref['verse']}" if ref.get("chapter") and ref.get("verse") else ref["source"]
+                for ref in duplicates
+            })
+            parts.append(f"Also in: {', '.join(also_in)}")
+        
         # Add Sanskrit if available
         if result.get("sanskrit"):
             parts.append(f"Sanskrit: {result['sanskrit']}")
@@ -159,80 +373,60 @@ class RAGService:
         
         return "\n".join(parts)
     
+    def _embed_query(self, text: str) -> List[float]:
+        """Embedding of a query (blocks on the background event loop; see _aembed_query)"""
+        return run_sync(self._aembed_query(text))[0]
+    
+    async def _aembed_query(self, text: str, deadline: Optional[Deadline] = None) -> Tuple[List[float], bool]:
+        """Embedding of a query, cached per embedding fingerprint, and whether it is the hash-based fallback
+        of a failed API call. Fallbacks are not cached, so the next request tries the API again. Concurrent
+        misses for the same text share one request."""
+        key = (self.api_client.embedding_fingerprint(), text)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is not None:
+            return embedding, False
+        return await self.embedding_flights.run(key, lambda: self._acompute_query_embedding(key, text, deadline))
+    
+    async def _acompute_query_embedding(self, key: tuple, text: str, deadline: Optional[Deadline]) -> Tuple[List[float], bool]:
+        if not self.config.EMBEDDING_USE_API:
+            embedding = await self.api_client.aget_embedding(text, deadline=deadline)
+        else:
+            row = (await self.api_client.aget_embeddings([text], fallback=False, deadline=deadline))[0]
+            if np.isnan(row).any():
+                logger.error("No API embedding for query, using hash-based embedding")
+                return self.api_client.get_embedding(text, use_api=False), True
+            embedding = row.tolist()
+        self.query_embedding_cache.put(key, embedding)
+        return embedding, False
+    
     def get_database_stats(self) -> Dict[str, Any]:
-        """Get statistics about the database"""
+        """Get statistics about the database, the query embedding and answer caches, request coalescing, provider health and connections"""
         try:
             info = self.vector_store.get_collection_info()
             return {
                 "total_documents": info.get("points_count", 0),
                 "indexed_documents": info.get("indexed_vectors_count", 0),
-                "status": info.get("status", "unknown")
+                "status": info.get("status", "unknown"),
+                "query_embedding_cache": self.query_embedding_cache.stats(),
+                "answer_cache": self.answer_cache.stats(),
+                "coalescing": {
+                    "answers": self.answer_flights.stats(),
+                    "query_embeddings": self.embedding_flights.stats()
+                },
+                "resilience": {
+                    **self.api_client.resilience_stats(),
+                    "deadline_seconds": self.config.REQUEST_DEADLINE,
+                    "degraded_answers": self.degraded_answers
+                },
+                "http": self.api_client.http_stats()
             }
         except Exception as e:
             logger.error(f"Error getting database stats: {e}")
             return {"error": str(e)}
     
     def _is_hindu_text_related(self, question: str) -> bool:
-        """Check if the question is related to Hindu texts - using a more permissive approach"""
-        hindu_keywords = [
-            'krishna', 'rama', 'ram', 'sita', 'hanuman', 'arjuna', 'dharma', 'karma', 'yoga', 'meditation',
-            'bhagavad', 'gita', 'ramayana', 'mahabharata', 'vedas', 'upanishads', 'sanskrit',
-            'moksha', 'nirvana', 'hindu', 'hinduism', 'spiritual', 'soul', 'atman', 'brahman',
-            'vishnu', 'shiva', 'ganesha', 'devi', 'goddess', 'god', 'divine', 'sacred', 'holy',
-            'temple', 'prayer', 'mantra', 'om', 'aum', 'patanjali', 'sage', 'guru', 'ashram',
-            'verse', 'chapter', 'shloka', 'sutra', 'philosophy', 'truth', 'consciousness',
-            'devotion', 'worship', 'faith', 'righteous', 'sin', 'virtue', 'ethics', 'duty',
-            'life', 'death', 'rebirth', 'purpose', 'peace', 'happiness', 'suffering', 'wisdom',
-            # Add common character names and relationships from texts
-            'dasharatha', 'pita', 'mata', 'father', 'mother', 'son', 'daughter', 'brother', 'sister',
-            'wife', 'husband', 'bharat', 'lakshmana', 'shatrughna', 'kaikeyi', 'kausalya', 'sumitra',
-            'ravana', 'lakshman', 'bharata', 'mandodari', 'surpanakha', 'kumbhakarna', 'vibhishana',
-            'pandava', 'kaurava', 'draupadi', 'yudhishthira', 'bhima', 'nakula', 'sahadeva',
-            'duryodhana', 'dushasana', 'shakuni', 'gandhari', 'kunti', 'madri', 'pandu', 'dhritarashtra'
-        ]
-        
-        question_lower = question.lower()
-        
-        # Check for Hindu-related keywords
-        has_hindu_keywords = any(keyword in question_lower for keyword in hindu_keywords)
-        
-        # Check for modern/celebrity names that should be rejected - be more specific
-        modern_keywords = [
-            'salman khan', 'akshay kumar', 'shah rukh khan', 'bollywood', 'actor', 'actress', 'movie', 'film',
-            'cricket', 'politics', 'politician', 'president', 'prime minister', 'covid', 'coronavirus',
-            'technology', 'computer', 'internet', 'facebook', 'instagram', 'whatsapp', 'twitter',
-            'stock market', 'cryptocurrency', 'bitcoin', 'business', 'company', 'startup',
-            'sports', 'football', 'tennis', 'olympics', 'ipl', 'match', 'score'
-        ]
-        
-        has_modern_keywords = any(keyword in question_lower for keyword in modern_keywords)
-        
-        # If it contains modern keywords, definitely not Hindu text related
-        if has_modern_keywords:
-            return False
-        
-        # Check for Hindi question patterns that are likely about Hindu texts
-        hindi_patterns = [
-            'kya naam', 'kaun', 'kahan', 'kaise', 'kyun', 'kya', 'ki', 'ka', 'ke',
-            'naam tha', 'naam hai', 'kon tha', 'kon hai', 'kahan tha', 'kahan hai'
-        ]
-        
-        has_hindi_patterns = any(pattern in question_lower for pattern in hindi_patterns)
-        
-        # More permissive approach - allow most philosophical and spiritual questions
-        spiritual_patterns = [
-            'what is', 'how to', 'meaning', 'significance', 'teaching', 'purpose of',
-            'why do', 'how can', 'what does', 'tell me about', 'explain', 'describe',
-            'who is', 'who was', 'where is', 'where was', 'when did'
-        ]
-        
-        has_spiritual_patterns = any(pattern in question_lower for pattern in spiritual_patterns)
-        
-        # Accept if it has Hindu keywords, or if it's a Hindi question about characters/relationships,
-        # or if it's a general spiritual/philosophical question
-        return (has_hindu_keywords or 
-                (has_hindi_patterns and len(question.strip()) > 5) or 
-                (has_spiritual_patterns and len(question.strip()) > 10))
+        """Check if the question is related to Hindu texts (keyword sets from Config.QUERY_KEYWORDS_FILE)"""
+        return self.query_preprocessor.is_domain_question(question)
 
     def search_by_verse(self, chapter: str, verse: str) -> Dict[str, Any]:
         """Search for a specific verse"""
@@ -242,7 +436,7 @@ class RAGService:
             # Get all documents to find the specific verse
             # This is a simplified approach - in production, you'd want to use metadata filtering
             search_results = self.vector_store.search(
-                query_embedding=self.api_client.get_embedding(f"chapter {chapter} verse {verse}"),
+                query_embedding=self._embed_query(f"chapter {chapter} verse {verse}"),
                 limit=50
             )
             
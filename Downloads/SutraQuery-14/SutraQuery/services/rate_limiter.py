@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketLimiter:
+    """Thread-safe limiter for a provider quota of requests per second and tokens per minute.
+
+    Callers block in acquire() until both buckets hold enough budget, so concurrent workers share the
+    quota instead of each bursting and sleeping on its own. The request rate adapts: a 429 halves it and
+    pauses every caller until Retry-After has passed, and each success restores a small fraction of the
+    configured rate (additive increase, multiplicative decrease)."""
+
+    def __init__(self, requests_per_second: float, tokens_per_minute: float,
+                 min_rate_fraction: float = 0.05, recovery_fraction: float = 0.02):
+        self.max_rate = float(requests_per_second)
+        self.rate = self.max_rate
+        self.min_rate = self.max_rate * min_rate_fraction
+        self.recovery = self.max_rate * recovery_fraction
+        self.token_rate = tokens_per_minute / 60.0
+
+        # Bursts: one second of requests, and ten seconds of tokens so a full-size request always fits
+        self.request_capacity = max(1.0, self.max_rate)
+        self.token_capacity = self.token_rate * 10
+        self.request_level = self.request_capacity
+        self.token_level = self.token_capacity
+        self.blocked_until = 0.0
+        self.updated = time.monotonic()
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        self.updated = now
+        self.request_level = min(self.request_capacity, self.request_level + elapsed * self.rate)
+        self.token_level = min(self.token_capacity, self.token_level + elapsed * self.token_rate)
+
+    def _reserve(self, tokens: float, started: float) -> float:
+        """Consume one request of `tokens` tokens and return 0 if it fits now, else the seconds until it
+        may fit. The caller holds the condition."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(
+            self.blocked_until - now,
+            (1.0 - self.request_level) / self.rate,
+            (tokens - self.token_level) / self.token_rate if self.token_rate else 0.0
+        )
+        if wait > 0:
+            return wait
+        self.request_level -= 1.0
+        self.token_level -= tokens
+        self.requests += 1
+        self.wait_seconds += now - started
+        return 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request of `tokens` tokens fits the quota, consume it and return the seconds waited.
+        A request larger than the token bucket waits for a full bucket."""
+        tokens = min(tokens, self.token_capacity)
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                wait = self._reserve(tokens, started)
+                if wait <= 0:
+                    return time.monotonic() - started
+                self._condition.wait(wait)
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """acquire for coroutines: sleeps on the event loop instead of blocking its thread"""
+        tokens = min(tokens, self.token_capacity)
+        started = time.monotonic()
+        while True:
+            with self._condition:
+                wait = self._reserve(tokens, started)
+            if wait <= 0:
+                return time.monotonic() - started
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        """Additive increase back towards the configured rate"""
+        with self._condition:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.recovery)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease, and hold every caller until Retry-After (or one request interval) has passed"""
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.rate_limited += 1
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+            self.request_level = min(self.request_level, 0.0)
+            logger.warning(f"Rate limited by provider; pausing {pause:.1f}s and lowering rate to {self.rate:.2f} req/s")
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "requests": self.requests,
+                "rate_limited": self.rate_limited,
+                "wait_seconds": round(self.wait_seconds, 2),
+                "current_rate": round(self.rate, 3),
+                "max_rate": self.max_rate
+            }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date); None if absent or malformed"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_shared_limiters: Dict[str, TokenBucketLimiter] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_limiter(key: str, requests_per_second: float, tokens_per_minute: float) -> TokenBucketLimiter:
+    """One limiter per quota (e.g. per API endpoint), shared by every client in the process"""
+    with _shared_lock:
+        limiter = _shared_limiters.get(key)
+        if limiter is None:
+            limiter = _shared_limiters[key] = TokenBucketLimiter(requests_per_second, tokens_per_minute)
+        return limiter
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """A request ran out of its time budget"""
+
+
+class CircuitOpenError(Exception):
+    """A provider's circuit is open, so the call was not attempted"""
+
+
+class Deadline:
+    """Time budget of one request, shared by all of its stages. Each stage is awaited with what is left
+    (run), and provider calls cap their own timeouts to it (timeout), so a slow stage cannot push the
+    request past the budget. A budget of None or 0 never runs out."""
+
+    def __init__(self, seconds: Optional[float]):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a budget"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, limit: float) -> float:
+        """limit, shortened to the time left"""
+        remaining = self.remaining()
+        return limit if remaining is None else min(limit, remaining)
+
+    def expires_within(self, seconds: float) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= seconds
+
+    async def run(self, awaitable: Awaitable, stage: str) -> Any:
+        """Await within the time left; on expiry the awaitable is cancelled and DeadlineExceeded names the stage"""
+        remaining = self.remaining()
+        if remaining is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"deadline exceeded during {stage}") from None
+
+
+class GuardedCall:
+    """One call inside CircuitBreaker.guard. Set neutral when its response says nothing about the provider's
+    health (e.g. a 429), so it neither counts as a success nor closes a half-open circuit."""
+
+    def __init__(self):
+        self.neutral = False
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker for one provider.
+
+    Closed: calls go through, and failure_threshold consecutive failures open the circuit. Open: calls
+    fail at once with CircuitOpenError for reset_timeout seconds. Half-open: one trial call is let
+    through; its success closes the circuit and its failure opens it again. Only outages (timeouts,
+    connection errors, server errors) count as failures; requests the provider rejects do not."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def _before_call(self) -> bool:
+        """Admit a call or raise CircuitOpenError; returns whether the call is the half-open trial"""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open":
+                if self._trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit is half-open and a trial call is in flight")
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def _after_call(self, failed: Optional[bool], trial: bool):
+        """failed is None for calls that say nothing about the provider's health (rejected, rate limited or
+        cancelled). Only the trial call frees the half-open slot; a call admitted before the circuit opened
+        must not let a second trial through."""
+        with self._lock:
+            if trial:
+                self._trial_in_flight = False
+            if failed is None:
+                return
+            if not failed:
+                self.successes += 1
+                self.consecutive_failures = 0
+                if self.state != "closed":
+                    logger.info(f"{self.name} circuit closed")
+                    self.state = "closed"
+                return
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.consecutive_failures >= self.failure_threshold):
+                logger.warning(f"{self.name} circuit opened after {self.consecutive_failures} consecutive failures; "
+                               f"failing fast for {self.reset_timeout:.0f}s")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+    @contextmanager
+    def guard(self, is_failure: Callable[[BaseException], bool]) -> Iterator["GuardedCall"]:
+        """Wrap one provider call: raises CircuitOpenError instead of calling while the circuit is open, and
+        records the outcome. is_failure decides whether an exception raised by the call is an outage; a call
+        that completes counts as a success unless it is marked neutral."""
+        call = GuardedCall()
+        trial = self._before_call()
+        try:
+            yield call
+        except BaseException as e:
+            self._after_call(True if isinstance(e, Exception) and is_failure(e) else None, trial)
+            raise
+        self._after_call(None if call.neutral else False, trial)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened
+            }
+
+
+class LatencyTracker:
+    """Latencies of a provider's recent successful calls, to decide when a duplicate request is worth sending"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """The given percentile of the recent latencies, or None until there are min_samples of them"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+_shared_breakers: Dict[str, CircuitBreaker] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_breaker(provider: str, failure_threshold: int, reset_timeout: float) -> CircuitBreaker:
+    """One circuit breaker per provider, shared by every client in the process"""
+    with _shared_lock:
+        breaker = _shared_breakers.get(provider)
+        if breaker is None:
+            breaker = _shared_breakers[provider] = CircuitBreaker(provider, failure_threshold, reset_timeout)
+        return breaker
@@ -0,0 +1,35 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight computation on the event loop.
+
+    The first caller starts the computation; callers arriving while it runs await the same task and get
+    its result or exception. The task is shielded, so a caller that is cancelled (e.g. its client went
+    away) does not cancel the computation for the others. Threaded callers share it too, since the
+    sync API runs every coroutine on the one background loop."""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, start: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(start())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        """Computations started, calls that joined one already in flight, and how many are running now"""
+        return {
+            "started": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight)
+        }
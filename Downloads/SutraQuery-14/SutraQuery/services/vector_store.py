@@ -1,9 +1,11 @@
 import logging
-from typing import List, Dict, Any, Optional
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+import uuid
+from typing import List, Dict, Any, Optional, Set
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import Distance, VectorParams, PointStruct, PointIdsList, Filter, FieldCondition, MatchValue
 from qdrant_client.http.exceptions import UnexpectedResponse
 from config import Config
+from services.async_runtime import run_sync
 
 logger = logging.getLogger(__name__)
 
@@ -11,8 +13,10 @@ class VectorStore:
     def __init__(self):
         self.config = Config()
         self.client = None
+        self._async_client = None
         self.collection_name = self.config.QDRANT_COLLECTION_NAME
         self.is_available = False
+        self.store_name = f"qdrant:{self.config.QDRANT_URL}/{self.collection_name}"
         
         try:
             self.client = QdrantClient(
@@ -49,19 +53,26 @@ class VectorStore:
             logger.error(f"Error ensuring collection exists: {e}")
             raise
     
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to the vector store"""
+    def add_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
+        """Add documents to the vector store. Upserts are durable, so persist is accepted only for parity with FaissVectorStore"""
         if not self.is_available:
             logger.warning("Vector store not available - cannot add documents")
             return
             
         try:
+            # Documents without a chunk id continue numbering after existing points
+            # so batched adds do not overwrite each other
+            start_id = 0
+            if any("id" not in doc for doc in documents):
+                start_id = self.client.count(collection_name=self.collection_name, exact=True).count
+            
             points = []
             for i, doc in enumerate(documents):
                 point = PointStruct(
-                    id=i,
-                    vector=doc["embedding"],
+                    id=self._point_id(doc["id"]) if "id" in doc else start_id + i,
+                    vector=doc["embedding"].tolist() if hasattr(doc["embedding"], "tolist") else doc["embedding"],
                     payload={
+                        "doc_id": doc.get("id"),
                         "text": doc["text"],
                         "source": doc.get("source", ""),
                         "chapter": doc.get("chapter", ""),
@@ -91,7 +102,11 @@ class VectorStore:
             raise
     
     def search(self, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Search for similar documents"""
+        """Search for similar documents (blocks on the background event loop; see asearch)"""
+        return run_sync(self.asearch(query_embedding, limit, source_filter))
+    
+    async def asearch(self, query_embedding: List[float], limit: int = 10, source_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search for similar documents through the async Qdrant client (run on the background event loop)"""
         if not self.is_available:
             logger.warning("Vector store not available - cannot search")
             return []
@@ -99,25 +114,34 @@ class VectorStore:
         try:
             search_filter = None
             if source_filter:
+                # A chunk matches its own source and the sources of the near-duplicates merged into it
                 search_filter = Filter(
-                    must=[
+                    should=[
                         FieldCondition(
                             key="source",
                             match=MatchValue(value=source_filter)
+                        ),
+                        FieldCondition(
+                            key="duplicates[].source",
+                            match=MatchValue(value=source_filter)
                         )
                     ]
                 )
             
-            search_result = self.client.search(
+            search_result = await self._get_async_client().query_points(
                 collection_name=self.collection_name,
-                query_vector=query_embedding,
+                query=query_embedding.tolist() if hasattr(query_embedding, "tolist") else query_embedding,
                 limit=limit,
                 query_filter=search_filter,
-                score_threshold=self.config.SIMILARITY_THRESHOLD
+                score_threshold=self.config.SIMILARITY_THRESHOLD,
+                with_payload=True
             )
             
             results = []
-            for hit in search_result:
+            for hit in search_result.points:
+                metadata = hit.payload.get("metadata", {})
+                if hit.payload.get("duplicates"):
+                    metadata = {**metadata, "duplicates": hit.payload["duplicates"]}
                 result = {
                     "text": hit.payload.get("text", ""),
                     "source": hit.payload.get("source", ""),
@@ -127,7 +151,7 @@ class VectorStore:
                     "translation": hit.payload.get("translation", ""),
                     "explanation": hit.payload.get("explanation", ""),
                     "score": hit.score,
-                    "metadata": hit.payload.get("metadata", {})
+                    "metadata": metadata
                 }
                 results.append(result)
             
@@ -138,6 +162,96 @@ class VectorStore:
             logger.error(f"Error searching vector store: {e}")
             return []
     
+    def _get_async_client(self) -> AsyncQdrantClient:
+        """Async Qdrant client bound to the background event loop, created on first use there"""
+        if self._async_client is None:
+            self._async_client = AsyncQdrantClient(
+                url=self.config.QDRANT_URL,
+                api_key=self.config.QDRANT_API_KEY
+            )
+        return self._async_client
+    
+    @staticmethod
+    def _point_id(doc_id: str) -> str:
+        """Qdrant point ids must be integers or UUIDs; chunk ids are 32 hex digits"""
+        return str(uuid.UUID(hex=doc_id))
+    
+    def get_document_ids(self) -> Set[str]:
+        """Return the chunk ids of all stored documents (points added without a chunk id are skipped)"""
+        if not self.is_available:
+            return set()
+            
+        try:
+            ids = set()
+            offset = None
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=1000,
+                    offset=offset,
+                    with_payload=False,
+                    with_vectors=False
+                )
+                for point in points:
+                    if isinstance(point.id, str):
+                        ids.add(uuid.UUID(point.id).hex)
+                if offset is None:
+                    return ids
+        except Exception as e:
+            logger.error(f"Error listing document ids: {e}")
+            raise
+    
+    def delete_documents(self, ids: List[str], persist: bool = True):
+        """Delete documents by chunk id"""
+        if not self.is_available:
+            logger.warning("Vector store not available - cannot delete documents")
+            return
+            
+        try:
+            point_ids = [self._point_id(doc_id) for doc_id in ids]
+            batch_size = 1000
+            for i in range(0, len(point_ids), batch_size):
+                self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=PointIdsList(points=point_ids[i:i + batch_size])
+                )
+            logger.info(f"Deleted {len(point_ids)} documents from vector store")
+            
+        except Exception as e:
+            logger.error(f"Error deleting documents from vector store: {e}")
+            raise
+    
+    def set_duplicate_references(self, references: Dict[str, List[Dict[str, Any]]], persist: bool = True):
+        """Record on each point the sources of the near-duplicates merged into it (an empty list clears them)"""
+        if not self.is_available:
+            logger.warning("Vector store not available - cannot update documents")
+            return
+        
+        try:
+            for doc_id, refs in references.items():
+                point_id = self._point_id(doc_id)
+                if refs:
+                    self.client.set_payload(
+                        collection_name=self.collection_name,
+                        payload={"duplicates": refs},
+                        points=[point_id]
+                    )
+                else:
+                    self.client.delete_payload(
+                        collection_name=self.collection_name,
+                        keys=["duplicates"],
+                        points=[point_id]
+                    )
+            logger.info(f"Updated duplicate references on {len(references)} documents")
+        
+        except Exception as e:
+            logger.error(f"Error updating duplicate references: {e}")
+            raise
+    
+    def flush(self):
+        """No-op: Qdrant persists points on upsert"""
+        pass
+    
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the collection"""
         if not self.is_available:
@@ -0,0 +1,13 @@
+import json
+import os
+from typing import Any
+
+
+def write_json_atomic(path: str, data: Any, **dump_kwargs):
+    """Write JSON to a temp file, fsync it and rename it over `path` so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
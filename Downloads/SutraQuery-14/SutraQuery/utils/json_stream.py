@@ -0,0 +1,154 @@
+import json
+from typing import Any, Iterator, List, Optional, TextIO
+
+_WHITESPACE = " \t\n\r"
+
+
+def peek_json_type(f: TextIO) -> str:
+    """Return the first non-whitespace character of a JSON document and rewind the file"""
+    f.seek(0)
+    while True:
+        char = f.read(1)
+        if not char or char not in _WHITESPACE:
+            f.seek(0)
+            return char
+
+
+class _ArrayReader:
+    """Reads the items of a JSON array from a text file through a bounded buffer.
+
+    Only the current item and an unread tail of at most a few read blocks are held in memory.
+    Items are decoded with the stdlib C decoder. With count_bytes, the UTF-8 byte offset of the read
+    position is tracked, which is only meaningful for files opened with newline=''."""
+
+    def __init__(self, f: TextIO, read_size: int, count_bytes: bool = False):
+        self.f = f
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.count_bytes = count_bytes
+        # UTF-8 length of everything before buffer[mark]
+        self.bytes_before_mark = 0
+        self.mark = 0
+
+    def byte_offset(self) -> int:
+        """Byte offset in the file of the read position"""
+        self.bytes_before_mark += len(self.buffer[self.mark:self.pos].encode('utf-8', 'surrogatepass'))
+        self.mark = self.pos
+        return self.bytes_before_mark
+
+    def fill(self, size: int) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+            return False
+        if self.count_bytes:
+            self.byte_offset()
+        # Drop what has already been consumed before growing the buffer
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        self.mark = 0
+        return True
+
+    def skip_whitespace(self) -> bool:
+        """Advance past whitespace; False if the input is exhausted"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return True
+            if not self.fill(self.read_size):
+                return False
+
+    def peek(self) -> str:
+        return self.buffer[self.pos]
+
+    def open_array(self) -> bool:
+        """Consume the opening '['; False if the array is empty"""
+        if not self.skip_whitespace() or self.peek() != "[":
+            raise ValueError("JSON document is not an array")
+        self.pos += 1
+        if not self.skip_whitespace():
+            raise ValueError("Unterminated JSON array")
+        return self.peek() != "]"
+
+    def decode_item(self) -> Any:
+        size = self.read_size
+        while True:
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The item is cut off by the end of the buffer; read more (doubling for large items)
+                if not self.fill(size):
+                    raise
+                size *= 2
+                continue
+            # A number cut by the buffer end decodes "successfully" ("-2" of "-2.5"), so only accept
+            # an item once the following delimiter is in the buffer or the input is exhausted
+            probe = end
+            while probe < len(self.buffer) and self.buffer[probe] in _WHITESPACE:
+                probe += 1
+            if (probe == len(self.buffer) or self.buffer[probe] not in ",]") and self.fill(size):
+                size *= 2
+                continue
+            self.pos = end
+            return item
+
+    def next_item(self) -> bool:
+        """Consume the delimiter after an item; False at the closing ']'"""
+        if not self.skip_whitespace():
+            raise ValueError("Unterminated JSON array")
+        if self.peek() == "]":
+            return False
+        if self.peek() != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {self.peek()!r}")
+        self.pos += 1
+        if not self.skip_whitespace():
+            raise ValueError("Unterminated JSON array")
+        return True
+
+
+def iter_json_array(f: TextIO, read_size: int = 64 * 1024) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array one at a time.
+
+    Only the current item and an unread tail of at most a few read blocks are held in memory,
+    so memory stays flat however large the file is. Items are decoded with the stdlib C decoder."""
+    reader = _ArrayReader(f, read_size)
+    if not reader.open_array():
+        return
+    while True:
+        yield reader.decode_item()
+        if not reader.next_item():
+            return
+
+
+def json_array_offsets(f: TextIO, read_size: int = 64 * 1024) -> List[int]:
+    """Byte offsets of the items of a top-level JSON array, in one streaming pass.
+    The file must be opened as UTF-8 with newline='' so characters map to the bytes on disk."""
+    reader = _ArrayReader(f, read_size, count_bytes=True)
+    offsets = []
+    if not reader.open_array():
+        return offsets
+    while True:
+        offsets.append(reader.byte_offset())
+        reader.decode_item()
+        if not reader.next_item():
+            return offsets
+
+
+def iter_json_array_items(f: TextIO, count: Optional[int] = None, read_size: int = 64 * 1024) -> Iterator[Any]:
+    """Yield up to `count` consecutive items of a JSON array (all remaining if None) from a file positioned at
+    the start of an item, e.g. at an offset from json_array_offsets"""
+    reader = _ArrayReader(f, read_size)
+    if count == 0 or not reader.skip_whitespace():
+        return
+    yielded = 0
+    while True:
+        yield reader.decode_item()
+        yielded += 1
+        if yielded == count or not reader.next_item():
+            return
@@ -0,0 +1,137 @@
+import mmap
+import re
+from typing import Iterable, Iterator, Tuple, Union
+
+RULER = b"-" * 40
+
+
+def _section_pattern(line_break: bytes, value: bytes) -> "re.Pattern[bytes]":
+    """Anchored pattern for the regular layout of a Kanda section: Chapter, Verse and Content lines in order"""
+    return re.compile(
+        rb"\s*Chapter:(" + value + rb")" + line_break +
+        rb"[ \t]*Verse:(" + value + rb")" + line_break +
+        rb"[ \t]*Content:(" + value + rb")"
+    )
+
+
+# Text read in universal-newline mode also breaks lines on \r; text embedded in JSON only on \n
+_SECTION_LF = _section_pattern(rb"\n", rb"[^\n]*")
+_SECTION_CR = _section_pattern(rb"(?:\r\n?|\n)", rb"[^\r\n]*")
+
+_GITA_CHAPTER = re.compile(r'(\d+)')
+_GITA_VERSE = re.compile(r'TEXT\s+(\d+)')
+
+
+def _line_start(buffer, section_start: int, pos: int, universal_newlines: bool) -> int:
+    """Offset of the start of the line containing `pos`, never before the section start"""
+    start = buffer.rfind(b"\n", section_start, pos) + 1
+    if universal_newlines:
+        start = max(start, buffer.rfind(b"\r", section_start, pos) + 1)
+    return max(start, section_start)
+
+
+def _line_end(buffer, pos: int, section_end: int, universal_newlines: bool) -> int:
+    """Offset of the end of the line containing `pos`, never past the section end"""
+    end = buffer.find(b"\n", pos, section_end)
+    if end == -1:
+        end = section_end
+    if universal_newlines:
+        carriage = buffer.find(b"\r", pos, end)
+        if carriage != -1:
+            end = carriage
+    return end
+
+
+def _last_field(buffer, key: bytes, section_start: int, section_end: int, universal_newlines: bool) -> str:
+    """Value of the last line of a section that starts with `key` (after optional whitespace)"""
+    pos = buffer.rfind(key, section_start, section_end)
+    while pos != -1:
+        line_start = _line_start(buffer, section_start, pos, universal_newlines)
+        if line_start == pos or not buffer[line_start:pos].decode('utf-8', 'surrogatepass').strip():
+            end = _line_end(buffer, pos, section_end, universal_newlines)
+            return _field(buffer[pos + len(key):end], key.decode('ascii'))
+        pos = buffer.rfind(key, section_start, pos)
+    return ""
+
+
+def _field(value: bytes, key: str) -> str:
+    return value.decode('utf-8', 'surrogatepass').replace(key, '').strip()
+
+
+def scan_kanda(buffer: Union[bytes, mmap.mmap], universal_newlines: bool = True) -> Iterator[Tuple[str, str, str]]:
+    """Yield (chapter, verse, content) for every ruler-delimited section of a Kanda text with content.
+
+    `buffer` is UTF-8 bytes or an mmap. Sections are walked front to back; a section in the regular
+    layout is read with one anchored match, anything else by searching back for the last line that
+    starts with each key. Only field values are decoded. As in the Kanda layout, the last
+    Chapter/Verse/Content line of a section wins and a field's value is the rest of its line.
+    `universal_newlines` treats a bare \r as a line break, like reading the file in text mode."""
+    carriage_returns = universal_newlines and buffer.find(b"\r") != -1
+    regular = (_SECTION_CR if carriage_returns else _SECTION_LF).match
+    find = buffer.find
+    section_start = 0
+    size = len(buffer)
+    while section_start <= size:
+        section_end = find(RULER, section_start)
+        if section_end == -1:
+            section_end = size
+        match = regular(buffer, section_start, section_end)
+        # The regular layout applies only if no later line of the section repeats a key
+        if match and (find(b":", match.end(), section_end) == -1
+                      or (find(b"Chapter:", match.end(), section_end) == -1
+                          and find(b"Verse:", match.end(), section_end) == -1
+                          and find(b"Content:", match.end(), section_end) == -1)):
+            chapter, verse, content = match.groups()
+            content = _field(content, 'Content:')
+            if content:
+                yield _field(chapter, 'Chapter:'), _field(verse, 'Verse:'), content
+        else:
+            content = _last_field(buffer, b"Content:", section_start, section_end, carriage_returns)
+            if content:
+                chapter = _last_field(buffer, b"Chapter:", section_start, section_end, carriage_returns)
+                verse = _last_field(buffer, b"Verse:", section_start, section_end, carriage_returns)
+                yield chapter, verse, content
+        section_start = section_end + len(RULER)
+
+
+def scan_gita(lines: Iterable[str]) -> Iterator[Tuple[str, str, str, str]]:
+    """Yield (chapter, verse, sanskrit, text) for every verse of a Gita edition text with a chapter,
+    verse number and translation. Each line is stripped once and visited once."""
+    chapter = verse = ""
+    sanskrit = []
+    content = []
+    # 0: looking for a verse, 1: collecting Sanskrit, 2: collecting translation and purport
+    state = 0
+
+    for line in lines:
+        line = line.strip()
+        if state == 1:
+            if line.startswith('TRANSLATION'):
+                state = 2
+            elif line and not line.startswith('TEXT'):
+                sanskrit.append(line)
+            continue
+        if state == 2:
+            if not line.startswith('TEXT '):
+                if line:
+                    content.append(line)
+                continue
+            text = ' '.join(content)
+            if text and chapter and verse:
+                yield chapter, verse, ' '.join(sanskrit), text
+            state = 0
+
+        if line.startswith(('Chapter-', 'CHAPTER')):
+            match = _GITA_CHAPTER.search(line)
+            chapter = match.group(1) if match else ""
+        elif line.startswith('TEXT '):
+            match = _GITA_VERSE.search(line)
+            verse = match.group(1) if match else ""
+            sanskrit = []
+            content = []
+            state = 1
+
+    if state == 2:
+        text = ' '.join(content)
+        if text and chapter and verse:
+            yield chapter, verse, ' '.join(sanskrit), text
@@ -1,13 +1,56 @@
 import re
+from bisect import bisect_right
 from typing import List
+from utils.tokenizer import token_ends, token_ends_many
+
+CHUNK_UNITS = ("chars", "tokens")
+
+# Break points tried in order of preference: sentence endings (., !, ?, danda, double danda),
+# paragraph breaks, then clause boundaries
+BOUNDARY_PATTERNS = (
+    re.compile(r'[.!?।॥]\s+'),
+    re.compile(r'\n\s*\n'),
+    re.compile(r'[,;]\s+'),
+)
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Verse references such as "1.1", "Chapter 1 Verse 2" and "ch. 1 v. 2", tried in order on lowercased text
+VERSE_REFERENCE_PATTERNS = (
+    re.compile(r'(\d+)\.(\d+)'),
+    re.compile(r'chapter\s+(\d+)\s+verse\s+(\d+)'),
+    re.compile(r'ch\.\s*(\d+)\s*v\.\s*(\d+)'),
+)
 
 class TextChunker:
-    def __init__(self, chunk_size: int = 400, overlap: int = 100):
+    def __init__(self, chunk_size: int = 400, overlap: int = 100, unit: str = "chars"):
+        """chunk_size and overlap count characters, or approximate embedding-model tokens
+        (see utils.tokenizer) in "tokens" mode"""
+        if unit not in CHUNK_UNITS:
+            raise ValueError(f"Unknown chunk unit {unit!r}; expected one of {CHUNK_UNITS}")
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.unit = unit
+    
+    def chunk_many(self, texts: List[str]) -> List[List[str]]:
+        """Chunk a batch of texts; in token mode every text that may need splitting is tokenized in one pass"""
+        if self.unit == "chars":
+            return [self.chunk_text(text) for text in texts]
+        
+        # A token is at least one character, so texts no longer than chunk_size characters fit as they are
+        ends, spans = token_ends_many([text for text in texts if len(text) > self.chunk_size])
+        spans = iter(spans)
+        return [self._chunk_tokens(text, ends, *next(spans)) if len(text) > self.chunk_size else ([text] if text else [])
+                for text in texts]
     
     def chunk_text(self, text: str) -> List[str]:
         """Split text into overlapping chunks"""
+        if self.unit == "tokens":
+            if len(text) <= self.chunk_size:
+                return [text] if text else []
+            ends = token_ends(text)
+            return self._chunk_tokens(text, ends, 0, len(ends), 0)
+        
         if not text or len(text) < self.chunk_size:
             return [text] if text else []
         
@@ -37,25 +80,48 @@ class TextChunker:
         
         return chunks
     
-    def _find_sentence_boundary(self, text: str, start: int, end: int) -> int:
-        """Find the best sentence boundary within the given range"""
-        # Look for sentence endings (., !, ?, ||)
-        sentence_pattern = r'[.!?।॥]\s+'
+    def _chunk_tokens(self, text: str, ends: List[int], first: int, stop: int, offset: int) -> List[str]:
+        """Token-mode chunk_text; ends[first:stop] are the token end offsets of text, shifted by offset"""
+        if stop - first <= self.chunk_size:
+            return [text]
         
-        # Search backwards from end to start
-        for match in re.finditer(sentence_pattern, text[start:end]):
-            return start + match.end()
+        chunks = []
+        begin = first
         
-        # If no sentence boundary found, look for other boundaries
-        # Look for paragraph breaks
-        paragraph_match = re.search(r'\n\s*\n', text[start:end])
-        if paragraph_match:
-            return start + paragraph_match.end()
+        while first < stop:
+            start = ends[first - 1] - offset if first > begin else 0
+            last = first + self.chunk_size
+            
+            # Same boundary search as chunk_text, over the characters of the last `overlap` tokens
+            if last < stop:
+                end = ends[last - 1] - offset
+                sentence_end = self._find_sentence_boundary(text, ends[max(last - 1 - self.overlap, begin)] - offset, end)
+                if sentence_end > start:
+                    end = sentence_end
+            else:
+                end = len(text)
+            
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            
+            if last >= stop:
+                break
+            
+            # Next chunk starts `overlap` tokens before the first token not fully inside this one
+            first = max(first + 1, bisect_right(ends, end + offset, first, stop) - self.overlap)
         
-        # Look for clause boundaries
-        clause_pattern = r'[,;]\s+'
-        for match in re.finditer(clause_pattern, text[start:end]):
-            return start + match.end()
+        return chunks
+    
+    def _find_sentence_boundary(self, text: str, start: int, end: int) -> int:
+        """Find the last boundary of the most preferred kind within text[start:end].
+        The window is scanned in place (pos/endpos behave like slicing) rather than copied."""
+        for pattern in BOUNDARY_PATTERNS:
+            boundary = 0
+            for match in pattern.finditer(text, start, end):
+                boundary = match.end()
+            if boundary:
+                return boundary
         
         # Return original end if no good boundary found
         return end
@@ -68,7 +134,7 @@ class TextNormalizer:
             return text
         
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = _WHITESPACE.sub(' ', text).strip()
         
         # Handle common Sanskrit punctuation
         text = text.replace('।', '.')
@@ -82,28 +148,17 @@ class TextNormalizer:
         if not query:
             return query
         
-        # Convert to lowercase for better matching
-        query = query.lower().strip()
-        
-        # Remove extra whitespace
-        query = re.sub(r'\s+', ' ', query)
-        
-        return query
+        # Convert to lowercase for better matching and collapse whitespace
+        # (str.split() splits on the same characters as \s)
+        return " ".join(query.lower().split())
     
     @staticmethod
     def extract_verse_reference(text: str) -> str:
         """Extract verse reference (chapter.verse) from text"""
-        # Look for patterns like "1.1", "Chapter 1 Verse 2", etc.
-        patterns = [
-            r'(\d+)\.(\d+)',
-            r'chapter\s+(\d+)\s+verse\s+(\d+)',
-            r'ch\.\s*(\d+)\s*v\.\s*(\d+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text.lower())
+        text = text.lower()
+        for pattern in VERSE_REFERENCE_PATTERNS:
+            match = pattern.search(text)
             if match:
-                if len(match.groups()) == 2:
-                    return f"{match.group(1)}.{match.group(2)}"
+                return f"{match.group(1)}.{match.group(2)}"
         
         return ""
@@ -0,0 +1,41 @@
+import re
+from bisect import bisect_right
+from itertools import accumulate
+from typing import List, Tuple
+
+# Approximates the BPE tokenizer of the embedding model closely enough to budget chunks: letter runs
+# of up to six characters (most English words are one token, longer words and Sanskrit transliterations
+# split), digit runs of up to three, and every other non-space character (punctuation, Devanagari
+# vowel signs) on its own. Each token carries the whitespace before it, so tokens tile the text.
+TOKEN_PATTERN = re.compile(r'\s*(?:[^\W\d_]{1,6}|\d{1,3}|\S)')
+
+# Joins texts tokenized in one pass; whitespace, so it never becomes part of a token's text
+_SEPARATOR = "\n"
+
+
+def token_ends(text: str) -> List[int]:
+    """End offset of every token in text (trailing whitespace belongs to no token)"""
+    return list(accumulate(map(len, TOKEN_PATTERN.findall(text))))
+
+
+def token_ends_many(texts: List[str]) -> Tuple[List[int], List[Tuple[int, int, int]]]:
+    """Tokenize a batch of texts with a single regex pass over the joined texts. Returns the token end
+    offsets in the joined text and, per text, (first token, stop token, offset of the text), so the ends
+    of text i are ends[first:stop] minus its offset."""
+    ends = token_ends(_SEPARATOR.join(texts))
+    spans = []
+    stop = 0
+    text_start = 0
+    for text in texts:
+        text_end = text_start + len(text)
+        # The separator is whitespace, so it is absorbed into the first token of the next text
+        # and a token never ends between two texts
+        first, stop = stop, bisect_right(ends, text_end, stop)
+        spans.append((first, stop, text_start))
+        text_start = text_end + len(_SEPARATOR)
+    return ends, spans
+
+
+def count_tokens(text: str) -> int:
+    """Approximate number of embedding-model tokens in text"""
+    return len(TOKEN_PATTERN.findall(text))